@@ -18,18 +18,37 @@
 """
 
 import argparse
+import hashlib
 import json
+import os
 import re
 import sys
 import time
 import logging
+import traceback
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, Any
 from decimal import Decimal, getcontext
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from eth_hash.auto import keccak
 
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
 # 设置高精度
 getcontext().prec = 78
 
@@ -99,7 +118,7 @@ class Logger:
     def __init__(self, log_file=None):
         self.log_file = log_file
         self.file_handler = None
-        self.timers = {}  # 存储各个任务的开始时间
+        self.timers = {}  # 存储各个任务的开始时间 (time.perf_counter)
 
         if self.log_file:
             # 创建日志目录
@@ -154,7 +173,7 @@ class Logger:
 
     def timer_start(self, task_name):
         """开始计时"""
-        self.timers[task_name] = time.time()
+        self.timers[task_name] = time.perf_counter()
         msg = f"开始: {task_name}"
         print(f"{self.COLORS['timer']}[⏱]{self.COLORS['reset']} {msg}")
         self._log_to_file('timer', msg)
@@ -162,7 +181,7 @@ class Logger:
     def timer_end(self, task_name):
         """结束计时并显示耗时"""
         if task_name in self.timers:
-            elapsed = time.time() - self.timers[task_name]
+            elapsed = time.perf_counter() - self.timers[task_name]
             msg = f"完成: {task_name} - 耗时: {self._format_time(elapsed)}"
             print(f"{self.COLORS['timer']}[⏱]{self.COLORS['reset']} {msg}")
             self._log_to_file('timer', msg)
@@ -226,6 +245,27 @@ def to_decimal(val) -> Decimal:
     return Decimal(str(to_int(val)))
 
 
+def write_json(data: Any, output_path: Path):
+    """
+    将结果写为缩进JSON文件
+
+    优先使用orjson (C实现)；orjson不支持超过64位的整数，
+    遇到256位storage值等无法编码的数据时回退到标准库json。
+    """
+    if ORJSON_AVAILABLE:
+        try:
+            output_path.write_bytes(orjson.dumps(
+                data, default=str,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+            ))
+            return
+        except TypeError:
+            pass
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+
+
 # =============================================================================
 # V3→V2格式转换函数
 # =============================================================================
@@ -304,6 +344,8 @@ class StateDiffAnalyzer:
         self.state_before = self._load_json("attack_state.json")
         self.state_after = self._load_json("attack_state_after.json")
         self.addresses_info = self._load_json("addresses.json")
+        # analyze_slot_changes结果缓存 (小写地址 → 变化列表, 调用方只读)
+        self._slot_changes_cache: Dict[str, List[Dict]] = {}
 
         # V3增强: 初始化Storage布局推断器
         if V3_AVAILABLE and self.addresses_info:
@@ -487,7 +529,21 @@ class StateDiffAnalyzer:
                     'change_direction': 'increase'
                 }
             ]
+
+        结果按地址缓存: 分析目标筛选、目标扫描、约束生成和V3布局推断
+        会对同一合约重复调用。返回的列表被多个调用方共享，不应修改。
         """
+        cache_key = address.lower()
+        cached = self._slot_changes_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        changes = self._compute_slot_changes(address)
+        self._slot_changes_cache[cache_key] = changes
+        return changes
+
+    def _compute_slot_changes(self, address: str) -> List[Dict]:
+        """计算合约的slot变化 (未缓存)"""
         storage_before = self.get_contract_storage(address, before=True)
         storage_after = self.get_contract_storage(address, before=False)
 
@@ -990,6 +1046,60 @@ class FunctionInfo:
             self.external_calls = []
 
 
+# =============================================================================
+# Slither解析结果缓存
+# =============================================================================
+#
+# Slither编译+解析是脚本解析中最慢的一步。函数列表与调用图只依赖脚本文件本身，
+# 因此按 (路径, mtime, 大小, Slither版本) 缓存到磁盘，进程内再加一层内存缓存。
+
+SLITHER_CACHE_DIR = Path.home() / ".cache" / "firewall_constraints" / "slither"
+
+_slither_memo: Dict[str, Dict] = {}
+
+
+def _slither_version() -> str:
+    try:
+        from importlib.metadata import version
+        return version('slither-analyzer')
+    except Exception:
+        return 'unknown'
+
+
+def _slither_cache_key(script_path: Path) -> str:
+    stat = script_path.stat()
+    raw = f"{script_path.resolve()}:{stat.st_mtime_ns}:{stat.st_size}:{_slither_version()}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _load_slither_cache(key: str) -> Optional[Dict]:
+    """读取缓存的Slither结果 {'functions': [...], 'call_graph': {...}}"""
+    if key in _slither_memo:
+        return _slither_memo[key]
+
+    cache_file = SLITHER_CACHE_DIR / f"{key}.json"
+    if not cache_file.exists():
+        return None
+    try:
+        raw = cache_file.read_bytes()
+        data = orjson.loads(raw) if ORJSON_AVAILABLE else json.loads(raw)
+    except (OSError, ValueError) as e:
+        logger.debug(f"Slither缓存读取失败: {cache_file}: {e}")
+        return None
+
+    _slither_memo[key] = data
+    return data
+
+
+def _save_slither_cache(key: str, data: Dict):
+    _slither_memo[key] = data
+    try:
+        SLITHER_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        write_json(data, SLITHER_CACHE_DIR / f"{key}.json")
+    except OSError as e:
+        logger.debug(f"Slither缓存写入失败: {e}")
+
+
 class AttackScriptParser:
     """攻击脚本解析器 - 增强版: 支持回调函数识别和调用图遍历"""
 
@@ -1080,8 +1190,20 @@ class AttackScriptParser:
         self.use_slither = use_slither and SLITHER_AVAILABLE
         self.slither_func_analyzer = None
         self.slither_callgraph_builder = None
+        self._slither_cache_key = None
+        self._slither_cached: Optional[Dict] = None
+        self._slither_fresh: Dict = {}
 
         if self.use_slither:
+            try:
+                self._slither_cache_key = _slither_cache_key(script_path)
+                self._slither_cached = _load_slither_cache(self._slither_cache_key)
+            except OSError:
+                self._slither_cache_key = None
+
+        if self.use_slither and self._slither_cached:
+            logger.info("✓ 使用Slither缓存的AST解析结果")
+        elif self.use_slither:
             try:
                 logger.debug(f"初始化Slither分析器: {script_path}")
                 self.slither_func_analyzer = SlitherFunctionAnalyzer(str(script_path))
@@ -1589,7 +1711,7 @@ class AttackScriptParser:
             return self._functions_cache
 
         # 尝试使用Slither进行精确分析
-        if self.use_slither and self.slither_func_analyzer:
+        if self.use_slither and (self._slither_cached or self.slither_func_analyzer):
             try:
                 return self._discover_all_functions_slither()
             except Exception as e:
@@ -1606,21 +1728,33 @@ class AttackScriptParser:
         Returns:
             FunctionInfo列表
         """
-        logger.debug("  使用Slither进行函数发现...")
-        slither_funcs = self.slither_func_analyzer.discover_functions()
+        if self._slither_cached:
+            slither_funcs = self._slither_cached['functions']
+        else:
+            logger.debug("  使用Slither进行函数发现...")
+            slither_funcs = [
+                {
+                    'name': sf.name,
+                    'visibility': sf.visibility,
+                    'start_line': sf.start_line,
+                    'end_line': sf.end_line,
+                }
+                for sf in self.slither_func_analyzer.discover_functions()
+            ]
+            self._record_slither_result('functions', slither_funcs)
 
         functions = []
         for sf in slither_funcs:
             # 转换Slither的FunctionInfo到本地格式
             # 注意: Slither没有body文本,我们从源码提取
             func_body = ""
-            if sf.start_line > 0 and sf.end_line > 0:
+            if sf['start_line'] > 0 and sf['end_line'] > 0:
                 lines = self.script_content.split('\n')
-                func_body = '\n'.join(lines[sf.start_line-1:sf.end_line])
+                func_body = '\n'.join(lines[sf['start_line']-1:sf['end_line']])
 
             func_info = FunctionInfo(
-                name=sf.name,
-                visibility=sf.visibility,
+                name=sf['name'],
+                visibility=sf['visibility'],
                 start_pos=0,  # Slither不提供字符位置
                 end_pos=0,
                 body=func_body
@@ -1631,6 +1765,14 @@ class AttackScriptParser:
         self._functions_cache = functions
         return functions
 
+    def _record_slither_result(self, field: str, value):
+        """记录新的Slither结果,函数列表与调用图都齐全后写入缓存"""
+        if not self._slither_cache_key:
+            return
+        self._slither_fresh[field] = value
+        if 'functions' in self._slither_fresh and 'call_graph' in self._slither_fresh:
+            _save_slither_cache(self._slither_cache_key, self._slither_fresh)
+
     def _discover_all_functions_regex(self) -> List[FunctionInfo]:
         """
         使用正则表达式进行函数发现 (原有实现)
@@ -1789,10 +1931,15 @@ class AttackScriptParser:
             return self._call_graph_cache
 
         # 尝试使用Slither进行精确分析
+        if self.use_slither and self._slither_cached:
+            self._call_graph_cache = self._slither_cached['call_graph']
+            return self._call_graph_cache
+
         if self.use_slither and self.slither_callgraph_builder:
             try:
                 logger.debug("  使用Slither构建调用图...")
                 graph = self.slither_callgraph_builder.build_call_graph()
+                self._record_slither_result('call_graph', graph)
                 self._call_graph_cache = graph
                 logger.debug(f"  Slither构建调用图完成: {len(graph)} 个函数")
                 return graph
@@ -1977,33 +2124,314 @@ class AttackScriptParser:
         return None
 
 
+# =============================================================================
+# 动态约束表达式生成 (按关联类型分派)
+# =============================================================================
+#
+# 每个处理函数接收相同的参数，返回按 _EXPRESSION_FIELDS 顺序排列的元组:
+# (constraint_type, expression, semantics, danger_condition, safe_condition,
+#  threshold_value, reasoning)
+
+_EXPRESSION_FIELDS = (
+    'constraint_type', 'expression', 'semantics', 'danger_condition',
+    'safe_condition', 'threshold_value', 'reasoning'
+)
+
+
+def _expr_direct(param_name, state_var, ratio, change_direction,
+                 state_value, param_value, pattern):
+    """参数直接等于状态变化量"""
+    # 计算实际的危险阈值 (其它关联类型各自重新计算，只有direct需要)
+    if state_value > 0:
+        # 基于实际攻击使用的比例计算阈值
+        if param_value > 0:
+            attack_ratio = param_value / state_value
+            # 安全阈值设为攻击值的一定比例
+            safe_ratio = min(attack_ratio * 0.3, 0.5)  # 不超过50%
+        else:
+            safe_ratio = 0.3
+        threshold_value = int(state_value * safe_ratio)
+    else:
+        # 新建slot，使用after值
+        threshold_value = param_value // 2 if param_value > 0 else 0
+    threshold_str = str(threshold_value)
+
+    if change_direction == 'increase':
+        # 存入/铸造类：参数导致状态增加
+        semantics = f"Direct deposit/mint: parameter directly increases {state_var}"
+        reasoning = f"参数直接导致{state_var}增加{param_value}，阈值设为{threshold_str}"
+    else:
+        # 取出/销毁类：参数导致状态减少
+        semantics = f"Direct withdraw/burn: parameter directly decreases {state_var}"
+        reasoning = f"参数直接导致{state_var}减少{param_value}，阈值设为{threshold_str}"
+    return (
+        "absolute_threshold",
+        f"{param_name} > {threshold_str}",
+        semantics,
+        f"{param_name} >= {state_value}",
+        f"{param_name} <= {threshold_str}",
+        threshold_value,
+        reasoning,
+    )
+
+
+def _expr_double(param_name, state_var, ratio, change_direction,
+                 state_value, param_value, pattern):
+    """2倍关系，常见于LP操作"""
+    effective_impact = int(param_value * 2)
+    threshold_value = int(state_value * 0.25)  # 因为有2倍放大
+    threshold_str = str(threshold_value)
+    return (
+        "multiplied_threshold",
+        f"{param_name} * 2 > {state_var} * 0.5",
+        f"Double impact: parameter has 2x effect on {state_var}",
+        f"{param_name} >= {state_value // 2}",
+        f"{param_name} <= {threshold_str}",
+        threshold_value,
+        f"参数有2倍放大效应，实际影响{effective_impact}，阈值设为{threshold_str}",
+    )
+
+
+def _expr_multiple(param_name, state_var, ratio, change_direction,
+                   state_value, param_value, pattern):
+    """循环攻击，多次累积"""
+    # 添加合理性检查：迭代次数上限为10000
+    raw_iterations = round(ratio)
+    max_iterations = 10000
+    if raw_iterations > max_iterations:
+        # 如果迭代次数异常大，说明关联分析可能不准确
+        # 降级为heuristic处理，重新计算更合理的阈值
+        threshold_value = int(state_value * 0.3)
+        threshold_str = str(threshold_value)
+        return (
+            "capped_iterated_threshold",
+            f"{param_name} > {threshold_str}",
+            f"High-frequency operation: parameter affects {state_var} with estimated {raw_iterations} iterations (capped)",
+            f"{param_name} >= {int(state_value * 0.9)}",
+            f"{param_name} <= {threshold_str}",
+            threshold_value,
+            f"高频操作，原始迭代{raw_iterations}次超过上限{max_iterations}，使用保守阈值{threshold_str}",
+        )
+
+    iterations = raw_iterations
+    if iterations > 0:
+        threshold_value = int(state_value / iterations * 0.3)
+        state_per_iter = state_value // iterations
+        param_per_iter = param_value // iterations
+    else:
+        threshold_value = int(state_value * 0.3)
+        state_per_iter = state_value
+        param_per_iter = param_value
+    threshold_str = str(threshold_value)
+    iter_str = str(iterations)
+    return (
+        "iterated_threshold",
+        f"{param_name} * {iter_str} > {state_var} * 0.5",
+        f"Loop attack: parameter applied {iter_str} times affects {state_var}",
+        f"{param_name} >= {state_per_iter}",
+        f"{param_name} <= {threshold_str}",
+        threshold_value,
+        f"循环攻击{iter_str}次，单次参数{param_per_iter}，阈值设为{threshold_str}",
+    )
+
+
+def _expr_partial(param_name, state_var, ratio, change_direction,
+                  state_value, param_value, pattern):
+    """部分提取，参数小于变化量"""
+    extraction_ratio = ratio  # param / change
+    affected = state_value * extraction_ratio
+    threshold_value = int(affected * 0.5)
+    threshold_str = str(threshold_value)
+    return (
+        "ratio_threshold",
+        f"{param_name} > {threshold_str}",
+        f"Partial extraction: {extraction_ratio:.1%} of {state_var} affected per unit",
+        f"{param_name} >= {int(affected)}",
+        f"{param_name} <= {threshold_str}",
+        threshold_value,
+        f"部分提取模式，提取比例{extraction_ratio:.2f}，阈值设为{threshold_str}",
+    )
+
+
+def _expr_amplified(param_name, state_var, ratio, change_direction,
+                    state_value, param_value, pattern):
+    """放大效应，小参数导致大变化（如价格操纵）"""
+    # 添加合理性检查：放大系数上限
+    amplification = ratio
+    max_amplification = 1000000  # 100万倍
+    if amplification > max_amplification:
+        # 放大系数异常大，使用保守处理
+        threshold_value = int(state_value * 0.3)
+        threshold_str = str(threshold_value)
+        ratio_str = f"{ratio:.0f}"
+        return (
+            "capped_amplified_threshold",
+            f"{param_name} > {threshold_str}",
+            f"Extreme amplification: parameter has {ratio_str}x effect on {state_var} (capped)",
+            f"{param_name} >= {int(state_value * 0.9)}",
+            f"{param_name} <= {threshold_str}",
+            threshold_value,
+            f"极端放大效应{ratio_str}倍超过上限，使用保守阈值{threshold_str}",
+        )
+
+    threshold_value = int(state_value / amplification * 0.1)
+    threshold_str = str(threshold_value)
+    amplification_str = f"{amplification:.0f}"
+    return (
+        "amplified_threshold",
+        f"{param_name} > {threshold_str}",
+        f"Amplified effect: parameter has {amplification_str}x amplification on {state_var}",
+        f"{param_name} * {int(amplification)} >= {state_var}",
+        f"{param_name} <= {threshold_str}",
+        threshold_value,
+        f"放大效应{amplification_str}倍，小参数可导致大变化，阈值设为{threshold_str}",
+    )
+
+
+def _expr_heuristic(param_name, state_var, ratio, change_direction,
+                    state_value, param_value, pattern):
+    """无法确定关联，使用保守估计"""
+    if state_value > 0:
+        threshold_value = int(state_value * 0.3)
+        danger_condition = f"{param_name} >= {int(state_value * 0.9)}"
+    else:
+        threshold_value = param_value // 2 if param_value > 0 else 10**18
+        danger_condition = f"{param_name} >= {param_value}"
+    threshold_str = str(threshold_value)
+    return (
+        "heuristic_threshold",
+        f"{param_name} > {threshold_str}",
+        f"Heuristic constraint based on {pattern} pattern",
+        danger_condition,
+        f"{param_name} <= {threshold_str}",
+        threshold_value,
+        f"启发式约束，基于{pattern}模式，阈值设为{threshold_str}",
+    )
+
+
+_CORRELATION_HANDLERS = {
+    'direct': _expr_direct,
+    'double': _expr_double,
+    'multiple': _expr_multiple,
+    'partial': _expr_partial,
+    'amplified': _expr_amplified,
+}
+
+
 # =============================================================================
 # 改进的约束生成器
 # =============================================================================
 
+# 延迟初始化占位符(区分"尚未构造"与"构造结果为None")
+_UNSET = object()
+
+# 离散型参数约束(地址/布尔/字节/数组)共享的analysis字段,导入时构造一次
+_DISCRETE_ANALYSIS_BASE = {
+    "state_value": None,
+    "threshold": None,
+    "coefficient": None,
+    "attack_intensity": None,
+    "correlation_type": "discrete",
+}
+
+# 参与约束生成的动态参数类型 (数值/地址/布尔/字节及其数组)
+_DYNAMIC_PARAM_TYPES = frozenset({
+    'uint256', 'int256', 'uint8', 'address', 'bool', 'bytes', 'bytes32',
+    'address[]', 'uint256[]', 'uint8[]', 'bytes[]'
+})
+
+# 启发式约束中固定不变的子结构 (只读, 各约束共享同一对象)
+_HEURISTIC_STATE_VARIABLE = {
+    "source": "storage",
+    "slot": "0x2",
+    "type": "uint256",
+    "semantic_name": "estimated_state"
+}
+_HEURISTIC_ANALYSIS = {
+    "state_value": None,
+    "threshold": None,
+    "coefficient": 0.5,
+    "attack_intensity": None,
+    "reasoning": "Heuristic constraint (no state diff available)",
+    "correlation_type": "heuristic",
+    "correlation_confidence": 0.3
+}
+
+# _extract_param_name 使用的预编译正则与排除列表
+_PARAM_NUM_RE = re.compile(r'^[\d_]+$')
+_PARAM_SCI_RE = re.compile(r'^\d+e\d+$')
+_PARAM_IDENT_RE = re.compile(r'\b([a-zA-Z_][a-zA-Z0-9_]*)\b')
+_PARAM_NAME_EXCLUDE = frozenset({
+    'address', 'this', 'true', 'false', 'uint256', 'int256',
+    'bytes', 'bytes32', 'i', 'j', 'k', 'e'
+})
+
+# 攻击模式描述 (启发式约束的semantics字段)
+_PATTERN_DESCRIPTIONS = {
+    'flashloan_attack': 'Large flashloan exceeding safe threshold',
+    'borrow_attack': 'Excessive borrowing depleting liquidity',
+    'large_deposit': 'Large deposit potentially manipulating pool',
+    'drain_attack': 'Draining significant portion of funds',
+    'swap_manipulation': 'Large swap causing price manipulation',
+    'collateral_manipulation': 'Collateral manipulation affecting liquidation',
+}
+
+# classify_batch 的规则编号 → 分类结果 (顺序与 _classify_behavior 的判断顺序一致)
+_BEHAVIOR_RULE_RESULTS = (
+    ('loop_attack', 0.9),
+    ('drain_attack', 0.85),
+    ('inflate_attack', 0.85),
+    ('flashloan_attack', 0.75),
+    ('price_manipulation', 0.7),
+    ('large_deposit', 0.65),
+    ('large_withdraw', 0.65),
+    ('unknown', 0.5),
+)
+
 class ConstraintGeneratorV2:
     """改进的约束生成器 - 基于状态差异分析"""
 
     def __init__(self, state_analyzer: StateDiffAnalyzer):
+        self.threshold_inferrer = ThresholdInferrer()
+        self.bind(state_analyzer)
+
+    def bind(self, state_analyzer: StateDiffAnalyzer):
+        """
+        绑定到新的状态分析器并重置所有与协议相关的状态
+
+        批量提取时同一个生成器实例会在多个协议间复用。
+        """
         self.state_analyzer = state_analyzer
         self.correlator = ParamStateCorrelator(state_analyzer)
-        self.threshold_inferrer = ThresholdInferrer()
         self._behavior_analysis_cache = None
 
-        # V3增强: 初始化符号执行求值器
+        # V3增强: 符号执行求值器延迟到首次使用时再初始化
+        # (仅balanceOf求值路径需要,多数运行中不会触发)
+        self._param_evaluator = _UNSET
+
+    @property
+    def param_evaluator(self):
+        """V3 SymbolicParameterEvaluator,首次访问时构造并缓存"""
+        if self._param_evaluator is _UNSET:
+            self._param_evaluator = self._create_param_evaluator()
+        return self._param_evaluator
+
+    def _create_param_evaluator(self):
+        """构造V3符号执行求值器,不可用时返回None"""
+        state_analyzer = self.state_analyzer
         if V3_AVAILABLE and hasattr(state_analyzer, 'layout_inferrer') and state_analyzer.layout_inferrer:
             try:
                 # SymbolicParameterEvaluator需要AST分析器和状态分析器
                 # 但我们在V2.5中没有AST,所以传入None,仅使用状态读取功能
-                self.param_evaluator = SymbolicParameterEvaluator(None, state_analyzer)
+                evaluator = SymbolicParameterEvaluator(None, state_analyzer)
                 logger.info("V3 SymbolicParameterEvaluator已初始化(无AST模式)")
+                return evaluator
             except Exception as e:
                 logger.warning(f"V3 SymbolicParameterEvaluator初始化失败: {e}, 回退到V2")
-                self.param_evaluator = None
-        else:
-            self.param_evaluator = None
-            if not V3_AVAILABLE:
-                logger.debug("V3不可用,跳过SymbolicParameterEvaluator初始化")
+                return None
+        if not V3_AVAILABLE:
+            logger.debug("V3不可用,跳过SymbolicParameterEvaluator初始化")
+        return None
 
     def _analyze_attack_behavior(self, slot_changes: List[Dict], loop_info: Optional[Dict]) -> Dict:
         """
@@ -2019,6 +2447,19 @@ class ConstraintGeneratorV2:
         if not slot_changes:
             return {'behavior_type': 'unknown', 'characteristics': {}, 'confidence': 0.0}
 
+        characteristics = self._compute_characteristics(slot_changes, loop_info)
+
+        # 基于特征推断攻击行为类型
+        behavior_type, confidence = self._classify_behavior(characteristics)
+
+        return {
+            'behavior_type': behavior_type,
+            'characteristics': characteristics,
+            'confidence': confidence
+        }
+
+    def _compute_characteristics(self, slot_changes: List[Dict], loop_info: Optional[Dict]) -> Dict:
+        """统计slot变化的行为特征"""
         # 统计特征
         new_slots = sum(1 for c in slot_changes if c.get('is_new_slot', False))
         increased_slots = sum(1 for c in slot_changes if c.get('change_direction') == 'increase')
@@ -2048,14 +2489,7 @@ class ConstraintGeneratorV2:
             'supply_change_pct': supply_change.get('change_pct', 0) if supply_change else 0
         }
 
-        # 基于特征推断攻击行为类型
-        behavior_type, confidence = self._classify_behavior(characteristics)
-
-        return {
-            'behavior_type': behavior_type,
-            'characteristics': characteristics,
-            'confidence': confidence
-        }
+        return characteristics
 
     def _classify_behavior(self, chars: Dict) -> Tuple[str, float]:
         """基于特征分类攻击行为"""
@@ -2089,6 +2523,64 @@ class ConstraintGeneratorV2:
 
         return ('unknown', 0.5)
 
+    def classify_batch(
+        self,
+        batch_slot_changes: List[List[Dict]],
+        batch_loop_info: List[Optional[Dict]]
+    ) -> List[Tuple[str, float]]:
+        """
+        批量分类多个攻击的行为 (离线批量分析使用)
+
+        先把每个攻击的特征汇总成 N×7 的特征矩阵，再用向量化规则一次性分类。
+        规则与 _classify_behavior 完全一致；NumPy不可用时逐个回退。
+
+        Returns:
+            与输入一一对应的 (behavior_type, confidence) 列表
+        """
+        n = len(batch_slot_changes)
+        results: List[Tuple[str, float]] = [('unknown', 0.0)] * n
+        rows = []
+        row_index = []
+        for i, (slot_changes, loop_info) in enumerate(zip(batch_slot_changes, batch_loop_info)):
+            if not slot_changes:
+                continue
+            chars = self._compute_characteristics(slot_changes, loop_info)
+            if not NUMPY_AVAILABLE:
+                results[i] = self._classify_behavior(chars)
+                continue
+            rows.append((
+                chars['new_slots_ratio'],
+                chars['increase_ratio'],
+                chars['decrease_ratio'],
+                chars['avg_change_pct'],
+                chars['loop_count'],
+                1.0 if chars['supply_direction'] == 'decrease' else 0.0,
+                chars['supply_change_pct'],
+            ))
+            row_index.append(i)
+
+        if not rows:
+            return results
+
+        # float64: 阈值比较需与标量版本 (Python float) 结果一致
+        chars_arr = np.asarray(rows, dtype=np.float64)
+        new_ratio, inc_ratio, dec_ratio, avg_pct, loops, supply_dec, supply_pct = chars_arr.T
+
+        conditions = [
+            (new_ratio > 0.5) & (loops > 5),
+            (dec_ratio > 0.6) & (supply_dec > 0),
+            (inc_ratio > 0.6) & (supply_pct > 50),
+            (supply_pct > 30) & (loops >= 1),
+            (avg_pct > 100) & (new_ratio < 0.3),
+            (avg_pct > 50) & (inc_ratio > dec_ratio),
+            avg_pct > 50,
+        ]
+        rule_ids = np.select(conditions, range(len(conditions)), default=len(conditions))
+
+        for i, rule_id in zip(row_index, rule_ids.tolist()):
+            results[i] = _BEHAVIOR_RULE_RESULTS[rule_id]
+        return results
+
     def _identify_attack_pattern(self, func_name: str, slot_changes: List[Dict] = None, loop_info: Dict = None) -> str:
         """
         识别攻击模式 - 优先使用行为分析，回退到函数名
@@ -2143,28 +2635,38 @@ class ConstraintGeneratorV2:
         """
         constraints = []
 
-        # 0. 过滤被保护的函数（如果有防火墙配置）
-        attack_calls = attack_info.get('attack_calls', [])
-        if firewall_config:
-            protected_functions = firewall_config.get_function_names()
-            if protected_functions:
-                attack_calls = [
-                    call for call in attack_calls
-                    if call.get('function') in protected_functions
-                ]
-                logger.info(f"  根据防火墙配置，分析 {len(attack_calls)}/{len(attack_info.get('attack_calls', []))} 个被保护函数")
-
-        if not attack_calls:
+        all_calls = attack_info.get('attack_calls', [])
+        if not all_calls:
             logger.warning("  没有要分析的函数调用")
             return constraints
 
-        # 1. 获取slot变化
+        protected_functions = firewall_config.get_function_names() if firewall_config else None
+
+        # 1. 先获取slot变化: 无状态变化时直接走启发式路径,无需逐个过滤调用
         slot_changes = self.state_analyzer.analyze_slot_changes(vuln_address)
 
         if not slot_changes:
+            if protected_functions and not any(
+                call.get('function') in protected_functions for call in all_calls
+            ):
+                logger.warning("  没有要分析的函数调用")
+                return constraints
             logger.warning("未检测到状态变化，使用启发式约束生成")
             return self._generate_heuristic_constraints(attack_info)
 
+        # 2. 过滤被保护的函数（如果有防火墙配置）
+        attack_calls = all_calls
+        if protected_functions:
+            attack_calls = [
+                call for call in all_calls
+                if call.get('function') in protected_functions
+            ]
+            logger.info(f"  根据防火墙配置，分析 {len(attack_calls)}/{len(all_calls)} 个被保护函数")
+
+        if not attack_calls:
+            logger.warning("  没有要分析的函数调用")
+            return constraints
+
         logger.info(f"检测到 {len(slot_changes)} 个slot变化")
 
         # 获取循环信息用于行为分析
@@ -2173,10 +2675,11 @@ class ConstraintGeneratorV2:
         # 重置行为分析缓存
         self._behavior_analysis_cache = None
 
-        # 2. 为每个攻击调用生成约束
+        # 3. 为每个攻击调用生成约束
         for call in attack_calls:
             func_name = call['function']
             params = call['parameters']
+            signature = call.get("signature")
 
             # 识别攻击模式 - 使用行为分析
             pattern = self._identify_attack_pattern(func_name, slot_changes, loop_info)
@@ -2186,14 +2689,14 @@ class ConstraintGeneratorV2:
             # 找到动态参数（扩展支持数组/地址/字节等）
             dynamic_params = [
                 p for p in params
-                if p['is_dynamic'] and p['type'] in (
-                    'uint256', 'int256', 'uint8', 'address', 'bool', 'bytes', 'bytes32',
-                    'address[]', 'uint256[]', 'uint8[]', 'bytes[]'
-                )
+                if p['is_dynamic'] and p['type'] in _DYNAMIC_PARAM_TYPES
             ]
 
             for param in dynamic_params:
                 p_type = param['type']
+                p_idx = param['index']
+                p_name = param.get('name') or p_idx
+                p_vexpr = param.get('value_expr')
 
                 # ====== 数值标量 ======
                 if p_type in ('uint256', 'int256', 'uint8'):
@@ -2252,29 +2755,25 @@ class ConstraintGeneratorV2:
                         continue
                     constraint = {
                         "function": func_name,
-                        "signature": call.get("signature"),
+                        "signature": signature,
                         "attack_pattern": pattern,
                         "constraint": {
                             "type": "discrete_addresses",
-                            "expression": f"{param.get('name') or param['index']} in observed_addresses",
+                            "expression": f"{p_name} in observed_addresses",
                             "semantics": "Restrict addresses to observed attack set",
                             "attack_values": addr_values,
                             "variables": {
                                 "addresses": {
                                     "source": "function_parameter",
-                                    "index": param['index'],
+                                    "index": p_idx,
                                     "type": p_type,
-                                    "value_expr": param.get('value_expr')
+                                    "value_expr": p_vexpr
                                 }
                             }
                         },
                         "analysis": {
-                            "state_value": None,
-                            "threshold": None,
-                            "coefficient": None,
-                            "attack_intensity": None,
+                            **_DISCRETE_ANALYSIS_BASE,
                             "reasoning": "Address whitelist derived from attack script",
-                            "correlation_type": "discrete",
                             "correlation_confidence": 0.3
                         }
                     }
@@ -2284,29 +2783,25 @@ class ConstraintGeneratorV2:
                 elif p_type == 'bool':
                     constraint = {
                         "function": func_name,
-                        "signature": call.get("signature"),
+                        "signature": signature,
                         "attack_pattern": pattern,
                         "constraint": {
                             "type": "discrete_bool",
-                            "expression": f"{param.get('name') or param['index']} in [true,false]",
+                            "expression": f"{p_name} in [true,false]",
                             "semantics": "Boolean flag must be explicit",
                             "attack_values": [True, False],
                             "variables": {
                                 "flag": {
                                     "source": "function_parameter",
-                                    "index": param['index'],
+                                    "index": p_idx,
                                     "type": "bool",
-                                    "value_expr": param.get('value_expr')
+                                    "value_expr": p_vexpr
                                 }
                             }
                         },
                         "analysis": {
-                            "state_value": None,
-                            "threshold": None,
-                            "coefficient": None,
-                            "attack_intensity": None,
+                            **_DISCRETE_ANALYSIS_BASE,
                             "reasoning": "Boolean parameter limited to true/false",
-                            "correlation_type": "discrete",
                             "correlation_confidence": 0.2
                         }
                     }
@@ -2319,19 +2814,19 @@ class ConstraintGeneratorV2:
                         continue
                     constraint = {
                         "function": func_name,
-                        "signature": call.get("signature"),
+                        "signature": signature,
                         "attack_pattern": pattern,
                         "constraint": {
                             "type": "bytes_pattern",
-                            "expression": f"{param.get('name') or param['index']} length in [{byte_info['min_len']},{byte_info['max_len']}]",
+                            "expression": f"{p_name} length in [{byte_info['min_len']},{byte_info['max_len']}]",
                             "semantics": "Restrict bytes payload length",
                             "attack_values": byte_info['samples'],
                             "variables": {
                                 "bytes": {
                                     "source": "function_parameter",
-                                    "index": param['index'],
+                                    "index": p_idx,
                                     "type": p_type,
-                                    "value_expr": param.get('value_expr')
+                                    "value_expr": p_vexpr
                                 }
                             },
                             "range": {
@@ -2340,12 +2835,8 @@ class ConstraintGeneratorV2:
                             }
                         },
                         "analysis": {
-                            "state_value": None,
-                            "threshold": None,
-                            "coefficient": None,
-                            "attack_intensity": None,
+                            **_DISCRETE_ANALYSIS_BASE,
                             "reasoning": "Bytes payload constrained by observed length",
-                            "correlation_type": "discrete",
                             "correlation_confidence": 0.2
                         }
                     }
@@ -2358,11 +2849,11 @@ class ConstraintGeneratorV2:
                         continue
                     constraint = {
                         "function": func_name,
-                        "signature": call.get("signature"),
+                        "signature": signature,
                         "attack_pattern": pattern,
                         "constraint": {
                             "type": "capped_array",
-                            "expression": f"{param.get('name') or param['index']} elements in [{numeric_info['min']},{numeric_info['max']}]",
+                            "expression": f"{p_name} elements in [{numeric_info['min']},{numeric_info['max']}]",
                             "semantics": "Restrict numeric array elements to observed range",
                             "attack_values": numeric_info['values'],
                             "range": {
@@ -2372,20 +2863,16 @@ class ConstraintGeneratorV2:
                             "variables": {
                                 "values": {
                                     "source": "function_parameter",
-                                    "index": param['index'],
+                                    "index": p_idx,
                                     "type": p_type,
-                                    "value_expr": param.get('value_expr')
+                                    "value_expr": p_vexpr
                                 }
                             },
                             "len_range": numeric_info.get('len_range')
                         },
                         "analysis": {
-                            "state_value": None,
-                            "threshold": None,
-                            "coefficient": None,
-                            "attack_intensity": None,
+                            **_DISCRETE_ANALYSIS_BASE,
                             "reasoning": "Numeric array bounded by observed values",
-                            "correlation_type": "discrete",
                             "correlation_confidence": 0.3
                         }
                     }
@@ -2642,10 +3129,12 @@ class ConstraintGeneratorV2:
         slot_change = correlation.get('slot_change', {}) if correlation else {}
         change_direction = slot_change.get('change_direction', 'increase')
         is_new_slot = slot_change.get('is_new_slot', False)
+        before_value = slot_change.get('before', state_value)
+        after_value = slot_change.get('after', state_value)
 
         # 变量名 - 改进的参数名提取逻辑
         param_name = self._extract_param_name(param.get('value_expr', 'amount'))
-        state_var = semantic if semantic != "unknown" else f"slot_{slot}"
+        state_var = sys.intern(semantic if semantic != "unknown" else f"slot_{slot}")
 
         # 基于关联类型和变化方向生成约束表达式
         constraint_info = self._generate_dynamic_expression(
@@ -2680,8 +3169,8 @@ class ConstraintGeneratorV2:
                         "slot": slot if slot.startswith('0x') or slot.isdigit() else f"0x{slot}",
                         "type": "uint256",
                         "semantic_name": semantic,
-                        "before_value": slot_change.get('before', state_value),
-                        "after_value": slot_change.get('after', state_value)
+                        "before_value": before_value,
+                        "after_value": after_value
                     }
                 },
                 "danger_condition": constraint_info['danger_condition'],
@@ -2708,7 +3197,9 @@ class ConstraintGeneratorV2:
             return slot_change.get('change_abs', 0)
         return 0
 
-    def _extract_param_name(self, value_expr: str) -> str:
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _extract_param_name(value_expr: str) -> str:
         """
         从参数表达式中提取规范的参数名
 
@@ -2726,7 +3217,7 @@ class ConstraintGeneratorV2:
         value_expr = value_expr.strip()
 
         # 1. 如果是纯数字或科学计数法，返回默认名
-        if re.match(r'^[\d_]+$', value_expr) or re.match(r'^\d+e\d+$', value_expr):
+        if _PARAM_NUM_RE.match(value_expr) or _PARAM_SCI_RE.match(value_expr):
             return 'amount'
 
         # 2. 如果包含balanceOf，返回amount
@@ -2735,15 +3226,11 @@ class ConstraintGeneratorV2:
 
         # 3. 提取第一个有效的变量名（字母开头，包含字母数字下划线）
         # 但排除关键字和常见无意义名称
-        tokens = re.findall(r'\b([a-zA-Z_][a-zA-Z0-9_]*)\b', value_expr)
-
-        # 排除列表
-        exclude = {'address', 'this', 'true', 'false', 'uint256', 'int256',
-                   'bytes', 'bytes32', 'i', 'j', 'k', 'e'}
-
-        for token in tokens:
-            if token.lower() not in exclude and len(token) > 1:
-                return token
+        for match in _PARAM_IDENT_RE.finditer(value_expr):
+            token = match.group(1)
+            if token.lower() not in _PARAM_NAME_EXCLUDE and len(token) > 1:
+                # 驻留: 同名参数在大量约束中作为字典键重复出现
+                return sys.intern(token)
 
         # 4. 如果没有找到有效变量名，返回默认
         return 'amount'
@@ -2768,151 +3255,16 @@ class ConstraintGeneratorV2:
         2. 根据变化方向确定约束类型（增加/减少）
         3. 计算实际的阈值而不是硬编码系数
         """
-
-        # 计算实际的危险阈值
-        if state_value > 0:
-            # 基于实际攻击使用的比例计算阈值
-            if param_value > 0:
-                attack_ratio = param_value / state_value
-                # 安全阈值设为攻击值的一定比例
-                safe_ratio = min(attack_ratio * 0.3, 0.5)  # 不超过50%
-            else:
-                safe_ratio = 0.3
-            threshold_value = int(state_value * safe_ratio)
-        else:
-            # 新建slot，使用after值
-            threshold_value = param_value // 2 if param_value > 0 else 0
-            safe_ratio = 0.5
-
-        # 根据关联类型生成不同的约束
-        if correlation_type == 'direct':
-            # 参数直接等于状态变化量
-            if change_direction == 'increase':
-                # 存入/铸造类：参数导致状态增加
-                expression = f"{param_name} > {threshold_value}"
-                danger_condition = f"{param_name} >= {state_value}"
-                safe_condition = f"{param_name} <= {threshold_value}"
-                semantics = f"Direct deposit/mint: parameter directly increases {state_var}"
-                reasoning = f"参数直接导致{state_var}增加{param_value}，阈值设为{threshold_value}"
-            else:
-                # 取出/销毁类：参数导致状态减少
-                expression = f"{param_name} > {threshold_value}"
-                danger_condition = f"{param_name} >= {state_value}"
-                safe_condition = f"{param_name} <= {threshold_value}"
-                semantics = f"Direct withdraw/burn: parameter directly decreases {state_var}"
-                reasoning = f"参数直接导致{state_var}减少{param_value}，阈值设为{threshold_value}"
-            constraint_type = "absolute_threshold"
-
-        elif correlation_type == 'double':
-            # 2倍关系，常见于LP操作
-            effective_impact = int(param_value * 2)
-            threshold_value = int(state_value * 0.25)  # 因为有2倍放大
-            expression = f"{param_name} * 2 > {state_var} * 0.5"
-            danger_condition = f"{param_name} >= {state_value // 2}"
-            safe_condition = f"{param_name} <= {threshold_value}"
-            semantics = f"Double impact: parameter has 2x effect on {state_var}"
-            reasoning = f"参数有2倍放大效应，实际影响{effective_impact}，阈值设为{threshold_value}"
-            constraint_type = "multiplied_threshold"
-
-        elif correlation_type == 'multiple':
-            # 循环攻击，多次累积
-            # 添加合理性检查：迭代次数上限为10000
-            raw_iterations = round(ratio)
-            max_iterations = 10000
-            if raw_iterations > max_iterations:
-                # 如果迭代次数异常大，说明关联分析可能不准确
-                # 降级为heuristic处理
-                iterations = max_iterations
-                # 重新计算更合理的阈值
-                threshold_value = int(state_value * 0.3)
-                expression = f"{param_name} > {threshold_value}"
-                danger_condition = f"{param_name} >= {int(state_value * 0.9)}"
-                safe_condition = f"{param_name} <= {threshold_value}"
-                semantics = f"High-frequency operation: parameter affects {state_var} with estimated {raw_iterations} iterations (capped)"
-                reasoning = f"高频操作，原始迭代{raw_iterations}次超过上限{max_iterations}，使用保守阈值{threshold_value}"
-                constraint_type = "capped_iterated_threshold"
-            else:
-                iterations = raw_iterations
-                threshold_value = int(state_value / iterations * 0.3) if iterations > 0 else int(state_value * 0.3)
-                expression = f"{param_name} * {iterations} > {state_var} * 0.5"
-                danger_condition = f"{param_name} >= {state_value // iterations if iterations > 0 else state_value}"
-                safe_condition = f"{param_name} <= {threshold_value}"
-                semantics = f"Loop attack: parameter applied {iterations} times affects {state_var}"
-                reasoning = f"循环攻击{iterations}次，单次参数{param_value // iterations if iterations > 0 else param_value}，阈值设为{threshold_value}"
-                constraint_type = "iterated_threshold"
-
-        elif correlation_type == 'partial':
-            # 部分提取，参数小于变化量
-            extraction_ratio = ratio  # param / change
-            threshold_value = int(state_value * extraction_ratio * 0.5)
-            expression = f"{param_name} > {threshold_value}"
-            danger_condition = f"{param_name} >= {int(state_value * extraction_ratio)}"
-            safe_condition = f"{param_name} <= {threshold_value}"
-            semantics = f"Partial extraction: {extraction_ratio:.1%} of {state_var} affected per unit"
-            reasoning = f"部分提取模式，提取比例{extraction_ratio:.2f}，阈值设为{threshold_value}"
-            constraint_type = "ratio_threshold"
-
-        elif correlation_type == 'amplified':
-            # 放大效应，小参数导致大变化（如价格操纵）
-            # 添加合理性检查：放大系数上限
-            amplification = ratio
-            max_amplification = 1000000  # 100万倍
-            if amplification > max_amplification:
-                # 放大系数异常大，使用保守处理
-                amplification = max_amplification
-                threshold_value = int(state_value * 0.3)
-                expression = f"{param_name} > {threshold_value}"
-                danger_condition = f"{param_name} >= {int(state_value * 0.9)}"
-                safe_condition = f"{param_name} <= {threshold_value}"
-                semantics = f"Extreme amplification: parameter has {ratio:.0f}x effect on {state_var} (capped)"
-                reasoning = f"极端放大效应{ratio:.0f}倍超过上限，使用保守阈值{threshold_value}"
-                constraint_type = "capped_amplified_threshold"
-            else:
-                threshold_value = int(state_value / amplification * 0.1)
-                expression = f"{param_name} > {threshold_value}"
-                danger_condition = f"{param_name} * {int(amplification)} >= {state_var}"
-                safe_condition = f"{param_name} <= {threshold_value}"
-                semantics = f"Amplified effect: parameter has {amplification:.0f}x amplification on {state_var}"
-                reasoning = f"放大效应{amplification:.0f}倍，小参数可导致大变化，阈值设为{threshold_value}"
-                constraint_type = "amplified_threshold"
-
-        else:
-            # heuristic - 无法确定关联，使用保守估计
-            if state_value > 0:
-                threshold_value = int(state_value * 0.3)
-                expression = f"{param_name} > {threshold_value}"
-                danger_condition = f"{param_name} >= {int(state_value * 0.9)}"
-                safe_condition = f"{param_name} <= {threshold_value}"
-            else:
-                threshold_value = param_value // 2 if param_value > 0 else 10**18
-                expression = f"{param_name} > {threshold_value}"
-                danger_condition = f"{param_name} >= {param_value}"
-                safe_condition = f"{param_name} <= {threshold_value}"
-            semantics = f"Heuristic constraint based on {pattern} pattern"
-            reasoning = f"启发式约束，基于{pattern}模式，阈值设为{threshold_value}"
-            constraint_type = "heuristic_threshold"
-
-        return {
-            'constraint_type': constraint_type,
-            'expression': expression,
-            'semantics': semantics,
-            'danger_condition': danger_condition,
-            'safe_condition': safe_condition,
-            'threshold_value': threshold_value,
-            'reasoning': reasoning
-        }
-
-    def _get_pattern_description(self, pattern: str) -> str:
+        handler = _CORRELATION_HANDLERS.get(correlation_type, _expr_heuristic)
+        return dict(zip(_EXPRESSION_FIELDS, handler(
+            param_name, state_var, ratio, change_direction,
+            state_value, param_value, pattern
+        )))
+
+    @staticmethod
+    def _get_pattern_description(pattern: str) -> str:
         """获取攻击模式描述"""
-        descriptions = {
-            'flashloan_attack': 'Large flashloan exceeding safe threshold',
-            'borrow_attack': 'Excessive borrowing depleting liquidity',
-            'large_deposit': 'Large deposit potentially manipulating pool',
-            'drain_attack': 'Draining significant portion of funds',
-            'swap_manipulation': 'Large swap causing price manipulation',
-            'collateral_manipulation': 'Collateral manipulation affecting liquidation',
-        }
-        return descriptions.get(pattern, 'Suspicious operation detected')
+        return _PATTERN_DESCRIPTIONS.get(pattern, 'Suspicious operation detected')
 
     def _generate_heuristic_constraints(self, attack_info: Dict) -> List[Dict]:
         """启发式约束生成（当没有状态差异时的后备方案）"""
@@ -2921,29 +3273,22 @@ class ConstraintGeneratorV2:
 
         for call in attack_info.get('attack_calls', []):
             func_name = call['function']
-            params = call['parameters']
             pattern = self._identify_attack_pattern(func_name)
 
             if not pattern:
                 continue
 
-            dynamic_params = [
-                p for p in params
-                if p['is_dynamic'] and p['type'] in (
-                    'uint256', 'int256', 'uint8', 'address', 'bool', 'bytes', 'bytes32',
-                    'address[]', 'uint256[]', 'uint8[]', 'bytes[]'
-                )
-            ]
-
-            for param in dynamic_params:
-                constraint = {
+            signature = f"{func_name}(...)"
+            semantics = self._get_pattern_description(pattern)
+            constraints.extend(
+                {
                     "function": func_name,
-                    "signature": f"{func_name}(...)",
+                    "signature": signature,
                     "attack_pattern": pattern,
                     "constraint": {
                         "type": "inequality",
-                        "expression": f"amount > state * 0.5",
-                        "semantics": self._get_pattern_description(pattern),
+                        "expression": "amount > state * 0.5",
+                        "semantics": semantics,
                         "variables": {
                             "amount": {
                                 "source": "function_parameter",
@@ -2951,27 +3296,16 @@ class ConstraintGeneratorV2:
                                 "type": "uint256",
                                 "value_expr": param['value_expr']
                             },
-                            "state": {
-                                "source": "storage",
-                                "slot": "0x2",
-                                "type": "uint256",
-                                "semantic_name": "estimated_state"
-                            }
+                            "state": _HEURISTIC_STATE_VARIABLE
                         },
                         "danger_condition": "amount > state * 0.5",
                         "safe_condition": "amount <= state * 0.1"
                     },
-                    "analysis": {
-                        "state_value": None,
-                        "threshold": None,
-                        "coefficient": 0.5,
-                        "attack_intensity": None,
-                        "reasoning": "Heuristic constraint (no state diff available)",
-                        "correlation_type": "heuristic",
-                        "correlation_confidence": 0.3
-                    }
+                    "analysis": _HEURISTIC_ANALYSIS
                 }
-                constraints.append(constraint)
+                for param in call['parameters']
+                if param['is_dynamic'] and param['type'] in _DYNAMIC_PARAM_TYPES
+            )
 
         return constraints
 
@@ -2980,6 +3314,18 @@ class ConstraintGeneratorV2:
 # 主提取器
 # =============================================================================
 
+# 所有提取结果共享的元数据 (只读)
+_RESULT_METADATA = {
+    "extraction_version": "2.0.0",
+    "generated_by": "extract_param_state_constraints_v2.py",
+    "improvements": [
+        "Based on actual state diff analysis",
+        "Dynamic threshold inference",
+        "Parameter-slot correlation"
+    ]
+}
+
+
 class ConstraintExtractorV2:
     """改进版约束提取器"""
 
@@ -2989,6 +3335,8 @@ class ConstraintExtractorV2:
         self.scripts_dir = repo_root / "src" / "test"
         self.use_firewall_config = use_firewall_config
         self.use_slither = use_slither
+        # 约束生成器在协议间复用, 每个协议通过bind()切换状态分析器
+        self._constraint_gen: Optional[ConstraintGeneratorV2] = None
 
         # 初始化防火墙配置读取器
         if self.use_firewall_config:
@@ -3041,7 +3389,7 @@ class ConstraintExtractorV2:
         logger.info(f"  识别到 {len(attack_info.get('attack_calls', []))} 个函数调用")
 
         # 状态差异分析（传入防火墙配置）
-        logger.timer_start(f"{protocol_name} - 状态差异分析")
+        logger.timer_start(f"{protocol_name} - 状态差异分析初始化")
         state_analyzer = StateDiffAnalyzer(protocol_dir, firewall_config)
         logger.timer_end(f"{protocol_name} - 状态差异分析初始化")
 
@@ -3051,31 +3399,39 @@ class ConstraintExtractorV2:
         logger.timer_end(f"{protocol_name} - 获取分析目标")
 
         # 分析所有目标合约的状态变化
+        # 扫描时直接记录变化最大的合约, 无需保留所有目标的变化列表
         logger.timer_start(f"{protocol_name} - 分析状态变化")
-        all_slot_changes = {}
+        changed_primary = None
+        primary_slot_changes = []
         for target_addr in analysis_targets:
             slot_changes = state_analyzer.analyze_slot_changes(target_addr)
             if slot_changes:
-                all_slot_changes[target_addr] = slot_changes
                 logger.info(f"  {target_addr[:12]}...: {len(slot_changes)} 个slot变化")
+                if len(slot_changes) > len(primary_slot_changes):
+                    changed_primary = target_addr
+                    primary_slot_changes = slot_changes
         logger.timer_end(f"{protocol_name} - 分析状态变化")
 
         # 如果没有任何状态变化，记录警告
-        if not all_slot_changes:
+        if changed_primary is None:
             logger.warning("  所有分析目标都没有状态变化")
 
         # 生成约束（传入防火墙配置）
         logger.timer_start(f"{protocol_name} - 生成约束")
-        constraint_gen = ConstraintGeneratorV2(state_analyzer)
+        if self._constraint_gen is None:
+            self._constraint_gen = ConstraintGeneratorV2(state_analyzer)
+        else:
+            self._constraint_gen.bind(state_analyzer)
+        constraint_gen = self._constraint_gen
 
         # 确定要使用的主要分析地址
         primary_address = None
 
         # 优先使用有状态变化的合约
-        if all_slot_changes:
+        if changed_primary is not None:
             # 选择变化最大的合约作为主要分析目标
-            primary_address = max(all_slot_changes.keys(), key=lambda k: len(all_slot_changes[k]))
-            logger.info(f"  使用变化最大的合约作为主要分析目标: {primary_address[:12]}... ({len(all_slot_changes[primary_address])} slots)")
+            primary_address = changed_primary
+            logger.info(f"  使用变化最大的合约作为主要分析目标: {primary_address[:12]}... ({len(primary_slot_changes)} slots)")
         elif vuln_address:
             # 如果没有状态变化，使用原始被攻击合约
             primary_address = vuln_address
@@ -3092,11 +3448,6 @@ class ConstraintExtractorV2:
         # 构建结果
         loop_info = attack_info.get('loop_info') or {}
 
-        # 获取主要分析地址的slot变化（用于构建结果）
-        primary_slot_changes = []
-        if primary_address and primary_address in all_slot_changes:
-            primary_slot_changes = all_slot_changes[primary_address]
-
         result = {
             "protocol": protocol_name,
             "year_month": year_month,
@@ -3119,15 +3470,7 @@ class ConstraintExtractorV2:
                 "loop_count": loop_info.get('count', 1),
                 "total_calls": len(attack_info.get('attack_calls', []))
             },
-            "metadata": {
-                "extraction_version": "2.0.0",
-                "generated_by": "extract_param_state_constraints_v2.py",
-                "improvements": [
-                    "Based on actual state diff analysis",
-                    "Dynamic threshold inference",
-                    "Parameter-slot correlation"
-                ]
-            }
+            "metadata": _RESULT_METADATA
         }
 
         logger.timer_end(f"提取协议: {protocol_name}")
@@ -3138,18 +3481,31 @@ class ConstraintExtractorV2:
         if not result:
             return
 
-        output_path = self.extracted_dir / year_month / protocol_name / "constraint_rules_v2.json"
+        output_path = self._result_path(protocol_name, year_month)
         output_path.parent.mkdir(parents=True, exist_ok=True)
 
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2, ensure_ascii=False, default=str)
+        write_json(result, output_path)
 
         logger.success(f"约束规则已保存: {output_path}")
 
-    def batch_extract(self, year_month_filter: str = None) -> Dict[str, Dict]:
-        """批量提取"""
+    def batch_extract(self, year_month_filter: str = None, jobs: int = 1,
+                      force: bool = False) -> List[Tuple[str, int]]:
+        """
+        批量提取
+
+        每个协议的完整结果写入文件后即释放, 只保留约束数量用于汇总。
+
+        Args:
+            year_month_filter: 年月过滤器
+            jobs: 并行进程数 (1 = 串行处理)
+            force: 忽略增量缓存, 重新分析所有协议
+
+        Returns:
+            [(protocol_name, 约束数量)] - 仅包含成功的协议
+        """
         logger.timer_start("批量提取")
-        results = {}
+        summary: List[Tuple[str, int]] = []
+        errors = []  # [(protocol_name, traceback)], 结束时统一写入文件
         processed_count = 0
         success_count = 0
         error_count = 0
@@ -3160,23 +3516,84 @@ class ConstraintExtractorV2:
             if filter_dir.exists():
                 year_month_dirs = [filter_dir]
         else:
-            year_month_dirs = [d for d in self.extracted_dir.iterdir() if d.is_dir()]
+            # 跳过 .cache 等隐藏目录
+            year_month_dirs = [
+                d for d in self.extracted_dir.iterdir()
+                if d.is_dir() and not d.name.startswith('.')
+            ]
 
-        # 统计总数
-        total_protocols = 0
+        # 收集待处理的协议
+        tasks = []
         for year_month_dir in year_month_dirs:
-            total_protocols += sum(1 for p in year_month_dir.iterdir() if p.is_dir())
+            year_month = year_month_dir.name
+            for protocol_dir in sorted(year_month_dir.iterdir()):
+                if protocol_dir.is_dir():
+                    tasks.append((protocol_dir.name, year_month))
 
+        total_protocols = len(tasks)
         logger.info(f"准备处理 {total_protocols} 个协议...")
 
-        for year_month_dir in year_month_dirs:
-            year_month = year_month_dir.name
+        # 增量缓存: 输入未变且输出文件未被改动的协议直接复用上次结果
+        manifest = self._load_batch_manifest()
+        input_hashes = {}
+        pending = []
+        for protocol_name, year_month in tasks:
+            input_hash = self._protocol_input_hash(protocol_name, year_month)
+            input_hashes[(protocol_name, year_month)] = input_hash
+            cached_count = None if force else self._unchanged_constraint_count(
+                manifest, protocol_name, year_month, input_hash
+            )
+            if cached_count is not None:
+                processed_count += 1
+                success_count += 1
+                summary.append((protocol_name, cached_count))
+            else:
+                pending.append((protocol_name, year_month))
+
+        if processed_count:
+            logger.info(f"输入未变化, 跳过 {processed_count} 个协议 (使用 --force 强制重新分析)")
+
+        def record_success(protocol_name: str, year_month: str, constraint_count: int):
+            summary.append((protocol_name, constraint_count))
+            input_hash = input_hashes[(protocol_name, year_month)]
+            output_path = self._result_path(protocol_name, year_month)
+            if input_hash and output_path.exists():
+                manifest[f"{year_month}/{protocol_name}"] = {
+                    "input_hash": input_hash,
+                    "output_hash": hashlib.sha1(output_path.read_bytes()).hexdigest(),
+                    "constraints": constraint_count,
+                }
 
-            for protocol_dir in sorted(year_month_dir.iterdir()):
-                if not protocol_dir.is_dir():
-                    continue
+        if jobs > 1 and len(pending) > 1:
+            logger.info(f"并行处理 (进程数: {jobs})")
+            worker_args = [
+                (self.repo_root, self.use_firewall_config, self.use_slither, protocol_name, year_month)
+                for protocol_name, year_month in pending
+            ]
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                outcomes = executor.map(_extract_protocol_worker, worker_args, chunksize=4)
+                for (protocol_name, year_month), (_, constraint_count, error) in zip(pending, outcomes):
+                    processed_count += 1
+                    if error:
+                        message, tb = error
+                        logger.error(f"[{processed_count}/{total_protocols}] 处理 {protocol_name} 时出错: {message}")
+                        errors.append((protocol_name, tb))
+                        error_count += 1
+                    elif constraint_count is not None:
+                        logger.info(f"[{processed_count}/{total_protocols}] ✓ {protocol_name}")
+                        record_success(protocol_name, year_month, constraint_count)
+                        success_count += 1
+                    else:
+                        logger.warning(f"[{processed_count}/{total_protocols}] ✗ {protocol_name}")
+                        error_count += 1
+        else:
+            # 串行提取前并发预读所有待处理协议的防火墙配置, extract_single中直接命中读取器缓存
+            if self.use_firewall_config and self.firewall_reader and pending:
+                logger.timer_start("预读防火墙配置")
+                self.firewall_reader.load_many(pending)
+                logger.timer_end("预读防火墙配置")
 
-                protocol_name = protocol_dir.name
+            for protocol_name, year_month in pending:
                 processed_count += 1
 
                 logger.info(f"\n{'='*60}")
@@ -3187,16 +3604,22 @@ class ConstraintExtractorV2:
                     result = self.extract_single(protocol_name, year_month)
                     if result is not None:
                         self.save_result(result, protocol_name, year_month)
-                        results[protocol_name] = result
+                        record_success(protocol_name, year_month, len(result.get('constraints', [])))
                         success_count += 1
                     else:
                         error_count += 1
                 except Exception as e:
                     logger.error(f"处理 {protocol_name} 时出错: {e}")
-                    import traceback
-                    traceback.print_exc()
+                    errors.append((protocol_name, traceback.format_exc()))
                     error_count += 1
 
+        self._save_batch_manifest(manifest)
+
+        if errors:
+            errors_path = self.extracted_dir / "constraint_extraction_errors_v2.json"
+            write_json([{"protocol": name, "traceback": tb} for name, tb in errors], errors_path)
+            logger.warning(f"错误详情已保存: {errors_path}")
+
         logger.timer_end("批量提取")
         logger.info(f"\n{'='*60}")
         logger.success(f"批量提取完成!")
@@ -3205,7 +3628,124 @@ class ConstraintExtractorV2:
         logger.error(f"失败: {error_count} 个")
         logger.info(f"{'='*60}")
 
-        return results
+        return summary
+
+    # -------------------------------------------------------------------------
+    # 批量增量缓存
+    # -------------------------------------------------------------------------
+
+    def _result_path(self, protocol_name: str, year_month: str) -> Path:
+        return self.extracted_dir / year_month / protocol_name / "constraint_rules_v2.json"
+
+    def _manifest_path(self) -> Path:
+        return self.extracted_dir / ".cache" / "batch_manifest.json"
+
+    def _load_batch_manifest(self) -> Dict[str, Dict]:
+        manifest_path = self._manifest_path()
+        if not manifest_path.exists():
+            return {}
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"增量缓存清单读取失败, 将重新分析: {e}")
+            return {}
+
+    def _save_batch_manifest(self, manifest: Dict[str, Dict]):
+        manifest_path = self._manifest_path()
+        try:
+            manifest_path.parent.mkdir(parents=True, exist_ok=True)
+            write_json(manifest, manifest_path)
+        except OSError as e:
+            logger.warning(f"增量缓存清单写入失败: {e}")
+
+    def _protocol_input_hash(self, protocol_name: str, year_month: str) -> Optional[str]:
+        """
+        计算协议输入指纹: 提取器代码 + 运行选项 + 攻击脚本内容 + 协议目录文件清单(大小/mtime)
+
+        输出文件 constraint_rules_v2.json 不计入 (启用防火墙配置时它同时是输入,
+        由清单中的output_hash校验其未被外部改动)。
+        """
+        script_path = self.scripts_dir / year_month / f"{protocol_name}.sol"
+        protocol_dir = self.extracted_dir / year_month / protocol_name
+        try:
+            h = hashlib.sha1(_extractor_fingerprint().encode())
+            h.update(f"{self.use_firewall_config}:{self.use_slither}".encode())
+            h.update(script_path.read_bytes())
+            for entry in sorted(os.scandir(protocol_dir), key=lambda e: e.name):
+                if entry.name == "constraint_rules_v2.json":
+                    continue
+                stat = entry.stat()
+                h.update(f"{entry.name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+        except OSError:
+            return None
+        return h.hexdigest()
+
+    def _unchanged_constraint_count(self, manifest: Dict[str, Dict], protocol_name: str,
+                                    year_month: str, input_hash: Optional[str]) -> Optional[int]:
+        """输入指纹与输出文件都与上次一致时返回上次的约束数量, 否则返回None"""
+        entry = manifest.get(f"{year_month}/{protocol_name}")
+        if not input_hash or not entry or entry.get("input_hash") != input_hash:
+            return None
+        if "constraints" not in entry:
+            return None
+
+        output_path = self._result_path(protocol_name, year_month)
+        try:
+            raw = output_path.read_bytes()
+        except OSError:
+            return None
+        if hashlib.sha1(raw).hexdigest() != entry.get("output_hash"):
+            return None
+        return entry["constraints"]
+
+
+@lru_cache(maxsize=1)
+def _extractor_fingerprint() -> str:
+    """提取器源码指纹 (代码变化时使增量缓存失效)"""
+    h = hashlib.sha1()
+    here = Path(__file__).resolve().parent
+    for name in (Path(__file__).name, "extract_param_state_constraints_v3.py"):
+        try:
+            h.update((here / name).read_bytes())
+        except OSError:
+            pass
+    return h.hexdigest()
+
+
+# 工作进程内复用的提取器 (每个进程按配置构造一次)
+_worker_extractor = None
+
+
+def _extract_protocol_worker(args: Tuple) -> Tuple[str, Optional[int], Optional[Tuple[str, str]]]:
+    """
+    处理单个协议 (在独立进程中执行)
+
+    结果在子进程内直接保存, 只把约束数量传回主进程。
+
+    Returns:
+        (protocol_name, 约束数量, error) - 提取失败时数量为None、出错时error为(错误信息, traceback)
+    """
+    global _worker_extractor
+    repo_root, use_firewall_config, use_slither, protocol_name, year_month = args
+
+    try:
+        config = (repo_root, use_firewall_config, use_slither)
+        if _worker_extractor is None or _worker_extractor[0] != config:
+            _worker_extractor = (config, ConstraintExtractorV2(
+                repo_root,
+                use_firewall_config=use_firewall_config,
+                use_slither=use_slither
+            ))
+        extractor = _worker_extractor[1]
+
+        result = extractor.extract_single(protocol_name, year_month)
+        if result is None:
+            return protocol_name, None, None
+        extractor.save_result(result, protocol_name, year_month)
+        return protocol_name, len(result.get('constraints', [])), None
+    except Exception as e:
+        return protocol_name, None, (str(e), traceback.format_exc())
 
 
 # =============================================================================
@@ -3224,6 +3764,9 @@ def main():
   # 批量处理
   python extract_param_state_constraints_v2.py --batch --filter 2024-01
 
+  # 批量并行处理 (8个进程)
+  python extract_param_state_constraints_v2.py --batch --filter 2024-01 --jobs 8
+
 改进:
   - 基于实际状态差异分析
   - 动态阈值推断
@@ -3243,6 +3786,10 @@ def main():
     parser.add_argument('--no-slither', dest='use_slither', action='store_false',
                        help='禁用Slither,使用正则表达式分析')
     parser.add_argument('--log-file', help='日志文件路径 (默认: logs/extract_constraints_YYYYMMDD_HHMMSS.log)')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                       help='批量模式的并行进程数 (默认: 1, 0 = CPU核心数)')
+    parser.add_argument('--force', action='store_true',
+                       help='批量模式下忽略增量缓存, 重新分析输入未变化的协议')
 
     args = parser.parse_args()
 
@@ -3276,16 +3823,17 @@ def main():
         logger.info("分析模式: 正则表达式(fallback)")
 
     # 记录开始时间
-    start_time = time.time()
+    start_time = time.perf_counter()
 
     if args.batch:
         logger.info("=== 批量提取模式 (V2) ===")
-        results = extractor.batch_extract(year_month_filter=args.filter)
+        jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+        summary = extractor.batch_extract(year_month_filter=args.filter, jobs=jobs, force=args.force)
 
         # 统计
-        total = len(results)
-        with_constraints = sum(1 for r in results.values() if r.get('constraints'))
-        total_constraints = sum(len(r.get('constraints', [])) for r in results.values())
+        total = len(summary)
+        with_constraints = sum(1 for _, n in summary if n)
+        total_constraints = sum(n for _, n in summary)
 
         logger.success(f"\n总计处理: {total} 个协议")
         logger.success(f"生成约束: {total_constraints} 个 ({with_constraints} 个协议)")
@@ -3298,8 +3846,7 @@ def main():
             if args.output:
                 output_path = Path(args.output)
                 output_path.parent.mkdir(parents=True, exist_ok=True)
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    json.dump(result, f, indent=2, ensure_ascii=False, default=str)
+                write_json(result, output_path)
                 logger.success(f"结果已保存到: {output_path}")
             else:
                 extractor.save_result(result, args.protocol, args.year_month)
@@ -3311,7 +3858,7 @@ def main():
         sys.exit(1)
 
     # 记录总耗时
-    total_time = time.time() - start_time
+    total_time = time.perf_counter() - start_time
     logger.info("="*60)
     logger.success(f"总耗时: {logger._format_time(total_time)}")
     logger.info(f"结束时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -13,16 +13,56 @@ V3核心改进:
 """
 
 import argparse
+import bisect
+import hashlib
+import importlib.util
+import itertools
 import json
+import operator
+import os
+import pickle
 import re
 import sys
 import subprocess
+import threading
+import traceback
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any, Set
+from typing import Dict, List, Optional, Tuple, Any, Set, Iterator
 from decimal import Decimal, getcontext
 from collections import defaultdict
 from dataclasses import dataclass, field
-from eth_utils import keccak
+from functools import lru_cache
+from operator import itemgetter
+
+try:
+    # pycryptodome: 直接调用C实现的keccak,避免eth_utils的参数转换开销
+    from Crypto.Hash import keccak as _crypto_keccak
+except ImportError:
+    _crypto_keccak = None
+
+# numpy / eth_utils导入开销较大 (合计约数百ms), 只在真正用到时才导入, 单独跑AST测试时不付出这部分启动成本
+NUMPY_AVAILABLE = importlib.util.find_spec('numpy') is not None
+
+
+@lru_cache(maxsize=1)
+def _numpy():
+    import numpy
+    return numpy
+
+
+def keccak(data: bytes) -> bytes:
+    """keccak256 (优先pycryptodome, 否则延迟导入eth_utils)"""
+    if _crypto_keccak is not None:
+        return _crypto_keccak.new(digest_bits=256, data=data).digest()
+    from eth_utils import keccak as eth_keccak
+    return eth_keccak(data)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
 
 # 设置高精度
 getcontext().prec = 78
@@ -41,26 +81,46 @@ class Logger:
         'debug': '\033[0;36m',
         'reset': '\033[0m'
     }
+    LEVELS = {'debug': 10, 'info': 20, 'success': 25, 'warning': 30, 'error': 40}
+    level = 10  # 低于该级别的消息不输出
 
     @staticmethod
-    def info(msg):
-        print(f"{Logger.COLORS['info']}[INFO]{Logger.COLORS['reset']} {msg}")
+    def set_level(name: str):
+        Logger.level = Logger.LEVELS[name]
+
+    @staticmethod
+    def _emit(kind: str, msg, args: tuple):
+        # 支持 logger.info("... %s", value) 形式: 被级别过滤掉的消息不做格式化
+        if Logger.LEVELS[kind] < Logger.level:
+            return
+        if args:
+            msg = msg % args
+        print(f"{Logger.COLORS[kind]}[{kind.upper()}]{Logger.COLORS['reset']} {msg}")
 
     @staticmethod
-    def success(msg):
-        print(f"{Logger.COLORS['success']}[SUCCESS]{Logger.COLORS['reset']} {msg}")
+    def info(msg, *args):
+        Logger._emit('info', msg, args)
 
     @staticmethod
-    def warning(msg):
-        print(f"{Logger.COLORS['warning']}[WARNING]{Logger.COLORS['reset']} {msg}")
+    def success(msg, *args):
+        Logger._emit('success', msg, args)
 
     @staticmethod
-    def error(msg):
-        print(f"{Logger.COLORS['error']}[ERROR]{Logger.COLORS['reset']} {msg}")
+    def warning(msg, *args):
+        Logger._emit('warning', msg, args)
 
     @staticmethod
-    def debug(msg):
-        print(f"{Logger.COLORS['debug']}[DEBUG]{Logger.COLORS['reset']} {msg}")
+    def error(msg, *args):
+        Logger._emit('error', msg, args)
+
+    @staticmethod
+    def debug(msg, *args):
+        Logger._emit('debug', msg, args)
+
+    @staticmethod
+    def exception(msg):
+        """输出错误信息及当前异常的traceback (在except块中调用)"""
+        Logger.error(f"{msg}\n{traceback.format_exc().rstrip()}")
 
 logger = Logger()
 
@@ -88,6 +148,11 @@ def to_decimal(val) -> Decimal:
     return Decimal(str(to_int(val)))
 
 
+# compute_mapping_slot 的线程本地64字节输入缓冲区 (key || base_slot)
+_slot_buffer = threading.local()
+
+
+@lru_cache(maxsize=65536)
 def compute_mapping_slot(key: str, base_slot: int) -> str:
     """
     计算Solidity mapping的storage slot
@@ -95,18 +160,84 @@ def compute_mapping_slot(key: str, base_slot: int) -> str:
     Formula: keccak256(abi.encodePacked(key, base_slot))
     """
     # 地址需要左填充到32字节
-    key_bytes = bytes.fromhex(key.replace('0x', '').zfill(64))
+    key_hex = key.replace('0x', '').zfill(64)
+
+    if _crypto_keccak is None or len(key_hex) != 64:
+        slot_hash = keccak(bytes.fromhex(key_hex) + base_slot.to_bytes(32, 'big'))
+        return '0x' + slot_hash.hex()
+
+    buf = getattr(_slot_buffer, 'buf', None)
+    if buf is None:
+        buf = _slot_buffer.buf = bytearray(64)
+    buf[:32] = bytes.fromhex(key_hex)
+    buf[32:] = base_slot.to_bytes(32, 'big')
+    return '0x' + _crypto_keccak.new(digest_bits=256, data=buf).hexdigest()
+
+
+def compute_mapping_slots_batch(keys: List[str], base_slot: int) -> List[str]:
+    """
+    批量计算同一base slot下多个key的mapping slot
+
+    所有 key || base_slot 预映像一次性拼接到连续缓冲区，再按64字节窗口逐个哈希，
+    省去每个key单独调用时的缓冲区准备与函数调用开销。
+
+    Returns:
+        与keys一一对应的slot列表 (格式同compute_mapping_slot)
+    """
     base_bytes = base_slot.to_bytes(32, 'big')
+    key_hexes = [key.replace('0x', '').zfill(64) for key in keys]
+    if _crypto_keccak is None or any(len(k) != 64 for k in key_hexes):
+        return [compute_mapping_slot(key, base_slot) for key in keys]
 
-    slot_hash = keccak(key_bytes + base_bytes)
-    return '0x' + slot_hash.hex()
+    buf = memoryview(b''.join(bytes.fromhex(k) + base_bytes for k in key_hexes))
+    new_hash = _crypto_keccak.new
+    return [
+        '0x' + new_hash(digest_bits=256, data=buf[offset:offset + 64]).hexdigest()
+        for offset in range(0, len(buf), 64)
+    ]
+
+
+def _build_mapping_slot_table(keys: List[str], base_slots: List[int]) -> Dict[str, Tuple[int, str]]:
+    """
+    计算 base_slot x key 的全部mapping slot, 返回 slot -> (base_slot, key) 反查表
+
+    每个key只做一次hex解码; 有NumPy时用 (B, K, 64) 字节数组广播拼接全部预映像,
+    再对连续缓冲区按64字节窗口逐个哈希。同一slot保留 (base_slot, key顺序) 上最先出现的组合。
+    """
+    table: Dict[str, Tuple[int, str]] = {}
+    if not keys or not base_slots:
+        return table
+
+    key_hexes = [key.replace('0x', '').zfill(64) for key in keys]
+    if _crypto_keccak is None or any(len(k) != 64 for k in key_hexes):
+        for base_slot in base_slots:
+            for key, slot in zip(keys, compute_mapping_slots_batch(keys, base_slot)):
+                table.setdefault(slot, (base_slot, key))
+        return table
+
+    key_bytes = [bytes.fromhex(k) for k in key_hexes]
+    base_bytes = [base_slot.to_bytes(32, 'big') for base_slot in base_slots]
+    if NUMPY_AVAILABLE:
+        np = _numpy()
+        preimages = np.empty((len(base_bytes), len(key_bytes), 64), dtype=np.uint8)
+        preimages[:, :, :32] = np.frombuffer(b''.join(key_bytes), dtype=np.uint8).reshape(1, -1, 32)
+        preimages[:, :, 32:] = np.frombuffer(b''.join(base_bytes), dtype=np.uint8).reshape(-1, 1, 32)
+        buf = memoryview(preimages.tobytes())
+    else:
+        buf = memoryview(b''.join(kb + bb for bb in base_bytes for kb in key_bytes))
+
+    new_hash = _crypto_keccak.new
+    pairs = ((base_slot, key) for base_slot in base_slots for key in keys)
+    for offset, pair in zip(range(0, len(buf), 64), pairs):
+        table.setdefault('0x' + new_hash(digest_bits=256, data=buf[offset:offset + 64]).hexdigest(), pair)
+    return table
 
 
 # =============================================================================
 # 数据结构定义
 # =============================================================================
 
-@dataclass
+@dataclass(slots=True)
 class ParamInfo:
     """参数信息"""
     ast_node: Dict
@@ -118,7 +249,7 @@ class ParamInfo:
     index: int = 0
 
 
-@dataclass
+@dataclass(slots=True)
 class LoopInfo:
     """循环信息"""
     count: Optional[int]
@@ -126,7 +257,7 @@ class LoopInfo:
     ast_node: Optional[Dict] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class CallInfo:
     """函数调用信息"""
     contract_address: str
@@ -137,7 +268,7 @@ class CallInfo:
     loop_context: Optional[LoopInfo] = None
 
 
-@dataclass
+@dataclass(slots=True)
 class ContractInfo:
     """合约信息"""
     address: str
@@ -147,7 +278,7 @@ class ContractInfo:
     score: float
 
 
-@dataclass
+@dataclass(slots=True)
 class AddressDeclaration:
     """地址声明信息"""
     variable_name: str  # 变量名(如 "wBARL")
@@ -159,7 +290,7 @@ class AddressDeclaration:
     line_number: int  # 源码行号
 
 
-@dataclass
+@dataclass(slots=True)
 class VariableInfo:
     """Storage变量信息"""
     slot: str
@@ -168,7 +299,7 @@ class VariableInfo:
     confidence: float
 
 
-@dataclass
+@dataclass(slots=True)
 class MappingInfo:
     """Mapping信息"""
     base_slot: int
@@ -178,12 +309,14 @@ class MappingInfo:
     known_keys: List[str]
 
 
-@dataclass
+@dataclass(slots=True)
 class StorageLayout:
     """Storage布局"""
     contract_address: str
     variables: Dict[str, VariableInfo] = field(default_factory=dict)
     mappings: Dict[str, MappingInfo] = field(default_factory=dict)
+    # 反向索引: 小写派生slot -> (mapping, key), 在add_mapping时一次性计算
+    _slot_index: Dict[str, Tuple[MappingInfo, str]] = field(default_factory=dict, init=False, repr=False, compare=False)
 
     def add_variable(self, slot: str, name: str, type: str, confidence: float):
         self.variables[slot] = VariableInfo(
@@ -191,11 +324,29 @@ class StorageLayout:
         )
 
     def add_mapping(self, base_slot: int, name: str, key_type: str, value_type: str, known_keys: List[str]):
-        self.mappings[str(base_slot)] = MappingInfo(
+        replaced = str(base_slot) in self.mappings
+        mapping = MappingInfo(
             base_slot=base_slot, name=name,
             key_type=key_type, value_type=value_type,
             known_keys=known_keys
         )
+        self.mappings[str(base_slot)] = mapping
+
+        if replaced:
+            self._rebuild_slot_index()
+        else:
+            self._index_mapping(mapping)
+
+    def _index_mapping(self, mapping: MappingInfo):
+        slots = compute_mapping_slots_batch(mapping.known_keys, mapping.base_slot)
+        for key, computed_slot in zip(mapping.known_keys, slots):
+            if key:
+                self._slot_index.setdefault(computed_slot.lower(), (mapping, key))
+
+    def _rebuild_slot_index(self):
+        self._slot_index.clear()
+        for mapping in self.mappings.values():
+            self._index_mapping(mapping)
 
     def get_semantic(self, slot: str) -> Optional[str]:
         """获取slot的语义名称"""
@@ -203,29 +354,11 @@ class StorageLayout:
             return self.variables[slot].name
 
         # 检查是否为mapping的派生slot
-        for mapping in self.mappings.values():
-            if self._is_derived_from_mapping(slot, mapping):
-                key = self._extract_key_from_slot(slot, mapping)
-                if key:
-                    return f"{mapping.name}[{key}]"
-
-        return None
+        entry = self._slot_index.get(slot.lower())
+        if entry:
+            mapping, key = entry
+            return f"{mapping.name}[{key}]"
 
-    def _is_derived_from_mapping(self, slot: str, mapping: MappingInfo) -> bool:
-        """检查slot是否由mapping派生"""
-        # 简化检查：看slot是否在known_keys中
-        for key in mapping.known_keys:
-            computed_slot = compute_mapping_slot(key, mapping.base_slot)
-            if computed_slot.lower() == slot.lower():
-                return True
-        return False
-
-    def _extract_key_from_slot(self, slot: str, mapping: MappingInfo) -> Optional[str]:
-        """从slot反推key"""
-        for key in mapping.known_keys:
-            computed_slot = compute_mapping_slot(key, mapping.base_slot)
-            if computed_slot.lower() == slot.lower():
-                return key
         return None
 
 
@@ -240,13 +373,135 @@ class CallGraph:
             self.external_calls[call.contract_address].append(call)
 
 
+class ASTUnavailableError(RuntimeError):
+    """artifacts中没有AST, 且forge/solc也无法产出AST"""
+
+
+# =============================================================================
+# AST磁盘缓存
+# =============================================================================
+#
+# forge build / solc 编译是构造SolidityASTAnalyzer时最慢的一步。AST只取决于
+# 脚本源码、编译器版本与remappings, 因此按三者的SHA256把解析好的AST pickle到磁盘,
+# 命中时直接读文件返回。设置 DEFIHACKLABS_AST_CACHE=0 可关闭。
+
+AST_CACHE_DIR = Path.home() / ".cache" / "defihacklabs" / "ast"
+
+
+def _ast_cache_enabled() -> bool:
+    return os.environ.get('DEFIHACKLABS_AST_CACHE', '1') != '0'
+
+
+@lru_cache(maxsize=1)
+def _compiler_version() -> str:
+    """forge/solc版本字符串 (进程内只查询一次)"""
+    for cmd in (['forge', '--version'], ['solc', '--version']):
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
+            if result.returncode == 0:
+                return result.stdout.strip()
+        except Exception:
+            continue
+    return 'unknown'
+
+
+def _ast_cache_key(script_path: Path, repo_root: Path) -> str:
+    digest = hashlib.sha256(script_path.read_bytes())
+    digest.update(_compiler_version().encode())
+    remappings_file = repo_root / "remappings.txt"
+    if remappings_file.exists():
+        digest.update(remappings_file.read_bytes())
+    return digest.hexdigest()
+
+
+def _load_ast_cache(key: str) -> Optional[Dict]:
+    cache_file = AST_CACHE_DIR / f"{key}.pkl"
+    if not cache_file.exists():
+        return None
+    try:
+        with open(cache_file, 'rb') as f:
+            return pickle.load(f)
+    except Exception as e:
+        logger.debug(f"AST缓存读取失败: {cache_file}: {e}")
+        return None
+
+
+def _save_ast_cache(key: str, ast: Dict):
+    cache_file = AST_CACHE_DIR / f"{key}.pkl"
+    tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        AST_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(ast, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        logger.debug(f"AST缓存写入失败: {e}")
+
+
+@lru_cache(maxsize=1)
+def _find_solc() -> Optional[str]:
+    """查找可用的solc (>= 0.8), 结果在进程内缓存, 避免每个分析器都启动子进程探测版本"""
+    solc_paths = ['/usr/bin/solc', 'solc']
+
+    for solc_path in solc_paths:
+        try:
+            result = subprocess.run([solc_path, '--version'], capture_output=True, text=True, timeout=5)
+            if result.returncode == 0:
+                version_output = result.stdout
+                if '0.8.' in version_output or '0.9.' in version_output:
+                    version_line = [line for line in version_output.split('\n') if 'Version:' in line]
+                    version_str = version_line[0] if version_line else version_output.split('\n')[0]
+                    logger.debug(f"使用solc: {solc_path} ({version_str.strip()})")
+                    return solc_path
+        except Exception as e:
+            logger.debug(f"检查{solc_path}失败: {e}")
+            continue
+
+    return None
+
+
+def _parse_artifact(artifact_file: Path, contract_name: str) -> Optional[Dict]:
+    """解析单个Foundry artifact, 返回其中目标源文件的AST (进程池worker, 需可pickle)"""
+    loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+    try:
+        artifact = loads(artifact_file.read_bytes())
+
+        # metadata只含源码不含AST, AST在rawMetadata的sources[*].ast字段
+        raw_metadata = artifact.get('rawMetadata')
+        if raw_metadata:
+            raw_data = loads(raw_metadata)
+            sources = raw_data.get('sources', {})
+            for source_path, source_data in sources.items():
+                if 'ast' in source_data and contract_name in source_path:
+                    return source_data['ast']
+    except Exception as e:
+        logger.debug(f"解析{artifact_file.name}失败: {e}")
+
+    return None
+
+
 # =============================================================================
 # 改进1: AST-Based Attack Script Parser
 # =============================================================================
 
+# 状态修改函数名关键字 (子串匹配, 忽略大小写)
+_STATE_CHANGE_RE = re.compile(
+    r'deposit|withdraw|mint|burn|transfer|swap|borrow|repay|flash|'
+    r'bond|debond|stake|unstake|claim|liquidate',
+    re.IGNORECASE
+)
+
+
+_LOOP_NODE_TYPES = frozenset({'ForStatement', 'WhileStatement', 'DoWhileStatement'})
+
+
 class SolidityASTAnalyzer:
     """基于Solidity编译器AST的静态分析器"""
 
+    # foundry.toml中只产出AST的profile (关闭优化器), 产物写到独立目录, 不污染默认out/
+    AST_PROFILE = 'ast'
+    ARTIFACT_DIRS = ('out-ast', 'out')
+
     def __init__(self, script_path: Path, repo_root: Path):
         self.script_path = script_path
         self.repo_root = repo_root
@@ -254,85 +509,98 @@ class SolidityASTAnalyzer:
         self.call_graph = None
         self.node_parents: Dict[int, Dict] = {}  # 维护父节点引用
         self.source_lines: List[str] = []
+        self._line_offsets: List[int] = [0]  # 每行起始字符偏移的前缀和
+        self._all_nodes: List[Dict] = []  # 整棵AST的扁平节点列表, 只遍历一次
+        self._nodes_by_type: Dict[str, List[Dict]] = defaultdict(list)  # nodeType -> 节点列表
+        self._var_values: Dict[str, Optional[str]] = {}  # 变量名 -> 字面量值
+        self._address_names: Dict[str, str] = {}  # 小写地址 -> 变量名
+        self._dependency_cache: Dict[int, List[str]] = {}  # id(node) -> 依赖变量
+        self._expr_cache: Dict[int, str] = {}  # AST节点id -> 重构出的表达式
+        self._candidates: Optional[List[ContractInfo]] = None  # identify_vulnerable_contracts的结果
 
         try:
             self.ast = self._get_ast()
             self.source_lines = script_path.read_text().split('\n')
-            self._build_parent_references()
+            self._line_offsets = list(itertools.accumulate(
+                (len(line) + 1 for line in self.source_lines), initial=0  # +1 for newline
+            ))
+            self._index_ast()
+            self._index_variable_values()
             self.call_graph = self._build_call_graph()
         except Exception as e:
             logger.warning(f"AST获取失败: {e}")
             raise
 
     def _get_ast(self) -> Dict:
-        """获取AST - 优先从forge build产物，fallback到solc"""
+        """获取AST - 优先读磁盘缓存，未命中再走forge/solc编译"""
+        if not _ast_cache_enabled():
+            return self._compile_ast()
+
+        key = _ast_cache_key(self.script_path, self.repo_root)
+        ast = _load_ast_cache(key)
+        if ast is not None:
+            logger.debug(f"AST缓存命中: {self.script_path.name}")
+            return ast
+
+        ast = self._compile_ast()
+        _save_ast_cache(key, ast)
+        return ast
+
+    def _compile_ast(self) -> Dict:
+        """编译获取AST - 优先从forge build产物，fallback到solc"""
         # 方法1: 从Foundry metadata读取 (最可靠)
         contract_name = self.script_path.stem
 
         # Foundry会为每个合约文件生成多个artifacts
         # 我们需要找到主测试合约的artifact
-        out_dir = self.repo_root / "out" / f"{contract_name}.sol"
+        out_dirs = [self.repo_root / d / f"{contract_name}.sol" for d in self.ARTIFACT_DIRS]
 
-        if out_dir.exists():
+        for out_dir in out_dirs:
+            if not out_dir.exists():
+                continue
             logger.debug(f"从Foundry artifacts读取AST: {out_dir}")
 
-            # 查找所有JSON artifacts
-            for artifact_file in out_dir.glob("*.json"):
-                try:
-                    with open(artifact_file, 'r') as f:
-                        artifact = json.load(f)
-
-                    # 检查metadata中的AST
-                    metadata_str = artifact.get('metadata')
-                    if metadata_str:
-                        metadata = json.loads(metadata_str)
-                        # Solidity编译器的metadata包含完整源码和AST
-                        sources = metadata.get('sources', {})
-                        for source_path, source_data in sources.items():
-                            if contract_name in source_path:
-                                # 找到了！但metadata只有源码，没有AST
-                                # 需要从rawMetadata或其他字段获取
-                                pass
-
-                    # 尝试从rawMetadata获取
-                    raw_metadata = artifact.get('rawMetadata')
-                    if raw_metadata:
-                        raw_data = json.loads(raw_metadata)
-                        sources = raw_data.get('sources', {})
-                        for source_path, source_data in sources.items():
-                            # AST在sources的ast字段
-                            if 'ast' in source_data and contract_name in source_path:
-                                logger.success(f"从{artifact_file.name}读取AST成功")
-                                return source_data['ast']
-
-                except Exception as e:
-                    logger.debug(f"解析{artifact_file.name}失败: {e}")
-                    continue
-
-        # 方法2: 强制重新编译获取AST
-        logger.info(f"未找到AST artifacts，使用forge build重新编译...")
-
-        # 使用forge来编译，这样会自动处理所有依赖
-        compile_cmd = ['forge', 'build', '--ast', '--force']
-
-        logger.debug(f"执行命令: {' '.join(compile_cmd)}")
-
-        result = subprocess.run(
-            compile_cmd,
-            capture_output=True,
-            text=True,
-            cwd=self.repo_root,
-            timeout=120
-        )
+            # 先只解析与脚本同名的artifact, 未命中再扫描目录下其余artifacts
+            # (同一.sol目录里常有大量被编译进来的库/接口合约)
+            preferred = out_dir / f"{contract_name}.json"
+            if preferred.exists():
+                ast = self._parse_artifacts([preferred], contract_name)
+                if ast is not None:
+                    return ast
+
+            artifact_files = [p for p in out_dir.glob("*.json") if p != preferred]
+            ast = self._parse_artifacts(artifact_files, contract_name)
+            if ast is not None:
+                return ast
+
+        # 方法2: forge增量编译获取AST
+        # artifacts已比脚本新却不含AST时, 重新编译也拿不到新东西, 直接交给solc
+        if any(self._artifacts_up_to_date(out_dir) for out_dir in out_dirs):
+            logger.info("artifacts已是最新但不含AST，跳过forge build")
+        elif not hasattr(self, '_retry_count'):
+            logger.info(f"未找到AST artifacts，使用forge build重新编译...")
+
+            # 使用forge来编译，这样会自动处理所有依赖 (不加--force, 依赖forge自身的增量编译)
+            compile_cmd = ['forge', 'build', '--ast']
+
+            logger.debug(f"执行命令: FOUNDRY_PROFILE={self.AST_PROFILE} {' '.join(compile_cmd)}")
+
+            result = subprocess.run(
+                compile_cmd,
+                capture_output=True,
+                text=True,
+                cwd=self.repo_root,
+                env={**os.environ, 'FOUNDRY_PROFILE': self.AST_PROFILE},
+                timeout=120
+            )
 
-        if result.returncode != 0:
-            logger.warning(f"forge build失败: {result.stderr}")
-        else:
-            logger.info("forge build成功，重新尝试从artifacts读取...")
-            # 递归调用自己（只递归一次）
-            if not hasattr(self, '_retry_count'):
+            if result.returncode != 0:
+                logger.warning(f"forge build失败: {result.stderr}")
+            else:
+                logger.info("forge build成功，重新尝试从artifacts读取...")
+                # 递归调用自己（只递归一次）
                 self._retry_count = 1
-                return self._get_ast()
+                return self._compile_ast()
 
         # 方法3: 使用solc编译（带remappings）
         logger.debug(f"使用solc编译获取AST")
@@ -344,30 +612,15 @@ class SolidityASTAnalyzer:
             with open(remappings_file, 'r') as f:
                 remappings = [line.strip() for line in f if line.strip() and not line.startswith('#')]
 
-        # 查找solc
-        solc_paths = ['/usr/bin/solc', 'solc']
-
-        solc_cmd = None
-        for solc_path in solc_paths:
-            try:
-                result = subprocess.run([solc_path, '--version'], capture_output=True, text=True, timeout=5)
-                if result.returncode == 0:
-                    version_output = result.stdout
-                    if '0.8.' in version_output or '0.9.' in version_output:
-                        solc_cmd = solc_path
-                        version_line = [line for line in version_output.split('\n') if 'Version:' in line]
-                        version_str = version_line[0] if version_line else version_output.split('\n')[0]
-                        logger.debug(f"使用solc: {solc_path} ({version_str.strip()})")
-                        break
-            except Exception as e:
-                logger.debug(f"检查{solc_path}失败: {e}")
-                continue
+        # 查找solc (进程内只探测一次)
+        solc_cmd = _find_solc()
 
         if not solc_cmd:
-            raise RuntimeError("solc >= 0.8.0 not found. Please install solidity compiler")
+            raise ASTUnavailableError("solc >= 0.8.0 not found. Please install solidity compiler")
 
         # 构建solc命令（带remappings）
-        cmd = [solc_cmd, '--ast-compact-json', '--base-path', str(self.repo_root)]
+        # --stop-after parsing: 只需要语法树, 跳过语义分析与代码生成
+        cmd = [solc_cmd, '--ast-compact-json', '--stop-after', 'parsing', '--base-path', str(self.repo_root)]
 
         # 添加remappings
         for remap in remappings:
@@ -379,70 +632,144 @@ class SolidityASTAnalyzer:
 
         logger.debug(f"执行命令: {' '.join(cmd)}")
 
-        result = subprocess.run(cmd, capture_output=True, text=True, cwd=self.repo_root, timeout=60)
+        # 以bytes接收输出: AST JSON可达数十MB, 省去整段解码为str再解析的开销
+        result = subprocess.run(cmd, capture_output=True, cwd=self.repo_root, timeout=60)
 
         if result.returncode != 0:
             # 最后尝试：简化命令
-            cmd_simple = [solc_cmd, '--ast-compact-json', str(self.script_path)]
-            result = subprocess.run(cmd_simple, capture_output=True, text=True, timeout=60)
+            cmd_simple = [solc_cmd, '--ast-compact-json', '--stop-after', 'parsing', str(self.script_path)]
+            result = subprocess.run(cmd_simple, capture_output=True, timeout=60)
 
             if result.returncode != 0:
-                raise RuntimeError(f"solc compilation failed: {result.stderr}")
+                stderr = result.stderr.decode('utf-8', errors='replace')
+                raise ASTUnavailableError(f"solc compilation failed: {stderr}")
 
-        # 解析输出
+        # 解析输出 (跳过JSON前的 "======= file =======" 头部)
         output = result.stdout
-        json_start = output.find('{')
+        json_start = output.find(b'{')
         if json_start == -1:
-            raise RuntimeError("No JSON found in solc output")
+            raise ASTUnavailableError("No JSON found in solc output")
 
-        json_str = output[json_start:]
-        return json.loads(json_str)
+        if ORJSON_AVAILABLE:
+            return orjson.loads(memoryview(output)[json_start:])
+        return json.loads(output[json_start:])
 
-    def _build_parent_references(self):
-        """构建AST节点的父节点引用"""
-        def walk(node: Dict, parent: Optional[Dict] = None):
-            if not isinstance(node, dict):
-                return
+    def _artifacts_up_to_date(self, out_dir: Path) -> bool:
+        """out_dir中最新的artifact是否不早于脚本本身"""
+        if not out_dir.exists():
+            return False
+        src_mtime = self.script_path.stat().st_mtime
+        art_mtime = max((p.stat().st_mtime for p in out_dir.glob('*.json')), default=0)
+        return art_mtime >= src_mtime
+
+    def _parse_artifacts(self, artifact_files: List[Path], contract_name: str) -> Optional[Dict]:
+        """并行解析artifacts (JSON解码是CPU密集的), 返回第一个找到的AST"""
+        if len(artifact_files) <= 1:
+            for artifact_file in artifact_files:
+                ast = _parse_artifact(artifact_file, contract_name)
+                if ast is not None:
+                    logger.success(f"从{artifact_file.name}读取AST成功")
+                    return ast
+            return None
 
-            node_id = node.get('id')
-            if node_id is not None and parent is not None:
-                self.node_parents[node_id] = parent
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+
+        workers = min(len(artifact_files), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(_parse_artifact, artifact_file, contract_name): artifact_file
+                for artifact_file in artifact_files
+            }
+            for future in as_completed(futures):
+                ast = future.result()
+                if ast is not None:
+                    logger.success(f"从{futures[future].name}读取AST成功")
+                    for pending in futures:
+                        pending.cancel()
+                    return ast
 
-            # 递归遍历子节点
-            for key, value in node.items():
-                if isinstance(value, dict):
-                    walk(value, node)
-                elif isinstance(value, list):
-                    for item in value:
-                        if isinstance(item, dict):
-                            walk(item, node)
+        return None
 
-        walk(self.ast)
+    def _index_ast(self):
+        """
+        单次遍历AST, 同时构建:
+        1. node_parents: 节点id -> 父节点
+        2. _all_nodes: 前序扁平节点列表
+        3. _nodes_by_type: nodeType -> 节点列表 (FunctionCall列表即调用图的待分析队列,
+           在遍历结束、父节点引用完整后再交给_build_call_graph处理)
+        """
+        stack: List[Tuple[Any, Optional[Dict]]] = [(self.ast, None)]
+        while stack:
+            current, parent = stack.pop()
+            if isinstance(current, dict):
+                node_id = current.get('id')
+                if node_id is not None and parent is not None:
+                    self.node_parents[node_id] = parent
+
+                self._all_nodes.append(current)
+                node_type = current.get('nodeType')
+                if node_type:
+                    self._nodes_by_type[node_type].append(current)
+
+                # 逆序入栈以保持前序顺序
+                stack.extend(
+                    (value, current) for value in reversed(list(current.values()))
+                    if isinstance(value, (dict, list))
+                )
+            elif isinstance(current, list):
+                # 列表不是AST节点, 其元素的父节点是包含该列表的节点
+                stack.extend((item, parent) for item in reversed(current))
+
+    def _nodes_of_type(self, node_type: str) -> List[Dict]:
+        return self._nodes_by_type.get(node_type, [])
+
+    def _index_variable_values(self):
+        """建立 变量名->值 与 地址->变量名 两张表 (同名/同地址以首次声明为准)"""
+        for node in self._nodes_of_type('VariableDeclaration'):
+            value_node = node.get('value')
+            if not value_node:
+                continue
+            value = self._extract_literal_value(value_node)
+            self._var_values.setdefault(node.get('name'), value)
+            if value:
+                self._address_names.setdefault(value.lower(), node.get('name', 'Unknown'))
 
     def _build_call_graph(self) -> CallGraph:
         """构建函数调用图"""
         graph = CallGraph()
 
         # 遍历AST找到所有外部调用
-        for node in self._walk_ast(self.ast):
-            if node.get('nodeType') == 'FunctionCall':
-                self._analyze_function_call(node, graph)
+        for node in self._nodes_of_type('FunctionCall'):
+            self._analyze_function_call(node, graph)
 
         return graph
 
-    def _walk_ast(self, node: Any) -> List[Dict]:
-        """遍历AST节点"""
-        nodes = []
+    @property
+    def node_count(self) -> int:
+        """AST节点总数 (取自_index_ast建立的扁平列表, 不重新遍历)"""
+        return len(self._all_nodes)
 
-        if isinstance(node, dict):
-            nodes.append(node)
-            for value in node.values():
-                nodes.extend(self._walk_ast(value))
-        elif isinstance(node, list):
-            for item in node:
-                nodes.extend(self._walk_ast(item))
+    def _walk_ast(self, node: Any) -> Iterator[Dict]:
+        """遍历AST节点; 整棵树直接复用_index_ast的前序扁平列表, 子树才实际遍历"""
+        if node is self.ast and self._all_nodes:
+            return iter(self._all_nodes)
+        return self._iter_subtree(node)
 
-        return nodes
+    @staticmethod
+    def _iter_subtree(node: Any) -> Iterator[Dict]:
+        """显式栈的前序遍历, 惰性产出, 无递归开销"""
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if isinstance(current, dict):
+                yield current
+                # 逆序入栈以保持与递归版本一致的前序顺序
+                stack.extend(
+                    value for value in reversed(list(current.values()))
+                    if isinstance(value, (dict, list))
+                )
+            elif isinstance(current, list):
+                stack.extend(reversed(current))
 
     def _analyze_function_call(self, node: Dict, graph: CallGraph):
         """分析单个函数调用节点"""
@@ -510,14 +837,7 @@ class SolidityASTAnalyzer:
 
     def _find_variable_value(self, var_name: str) -> Optional[str]:
         """查找变量的实际值"""
-        for node in self._walk_ast(self.ast):
-            if node.get('nodeType') == 'VariableDeclaration':
-                if node.get('name') == var_name:
-                    value_node = node.get('value')
-                    if value_node:
-                        return self._extract_literal_value(value_node)
-
-        return None
+        return self._var_values.get(var_name)
 
     def _extract_literal_value(self, node: Dict) -> Optional[str]:
         """从AST节点提取字面量值"""
@@ -582,7 +902,17 @@ class SolidityASTAnalyzer:
         return 'uint256'  # 默认
 
     def _reconstruct_expression(self, node: Dict) -> str:
-        """重构表达式字符串"""
+        """重构表达式字符串 (按AST节点id缓存, 共享子表达式只拼接一次)"""
+        node_id = node.get('id')
+        if node_id is None:
+            return self._build_expression(node)
+
+        expression = self._expr_cache.get(node_id)
+        if expression is None:
+            expression = self._expr_cache[node_id] = self._build_expression(node)
+        return expression
+
+    def _build_expression(self, node: Dict) -> str:
         node_type = node.get('nodeType', '')
 
         if node_type == 'Literal':
@@ -631,37 +961,37 @@ class SolidityASTAnalyzer:
 
     def _find_dependencies(self, node: Dict) -> List[str]:
         """查找表达式依赖的变量"""
+        cached = self._dependency_cache.get(id(node))
+        if cached is not None:
+            return list(cached)
+
         dependencies = []
+        seen: Set[str] = set()
 
         for sub_node in self._walk_ast(node):
             if sub_node.get('nodeType') == 'Identifier':
                 var_name = sub_node.get('name', '')
-                if var_name and var_name not in dependencies:
+                if var_name and var_name not in seen:
+                    seen.add(var_name)
                     dependencies.append(var_name)
 
-        return dependencies
+        self._dependency_cache[id(node)] = dependencies
+        return list(dependencies)
 
     def _find_loop_context(self, call_node: Dict) -> Optional[LoopInfo]:
         """查找调用是否在循环中"""
-        node_id = call_node.get('id')
-        if node_id is None:
+        if call_node.get('id') is None:
             return None
 
-        # 向上遍历父节点
+        # 沿node_parents向上遍历, 每步一次字典查找, 总代价O(深度)
         current = call_node
         while True:
-            parent_id = None
-            for nid, parent in self.node_parents.items():
-                if any(child.get('id') == current.get('id') for child in self._walk_ast(parent)):
-                    parent_id = parent.get('id')
-                    current = parent
-                    break
-
-            if parent_id is None:
+            current = self.node_parents.get(current.get('id'))
+            if current is None:
                 break
 
             node_type = current.get('nodeType', '')
-            if node_type in ['ForStatement', 'WhileStatement', 'DoWhileStatement']:
+            if node_type in _LOOP_NODE_TYPES:
                 return LoopInfo(
                     count=self._extract_loop_count(current),
                     type=node_type.replace('Statement', '').lower(),
@@ -699,16 +1029,15 @@ class SolidityASTAnalyzer:
         return None
 
     def _offset_to_line(self, offset: int) -> int:
-        """将字符偏移转换为行号"""
-        current_offset = 0
-        for line_num, line in enumerate(self.source_lines, 1):
-            current_offset += len(line) + 1  # +1 for newline
-            if current_offset > offset:
-                return line_num
-        return 0
+        """将字符偏移转换为行号 (二分查找行起始偏移)"""
+        line_num = bisect.bisect_right(self._line_offsets, offset)
+        return line_num if line_num < len(self._line_offsets) else 0
 
     def identify_vulnerable_contracts(self) -> List[ContractInfo]:
-        """识别被攻击的合约"""
+        """识别被攻击的合约 (调用图构建后不再变化, 结果按实例缓存)"""
+        if self._candidates is not None:
+            return list(self._candidates)
+
         candidates = []
 
         for contract_addr, calls in self.call_graph.external_calls.items():
@@ -733,29 +1062,17 @@ class SolidityASTAnalyzer:
                 score=score
             ))
 
-        return sorted(candidates, key=lambda x: x.score, reverse=True)
+        self._candidates = sorted(candidates, key=lambda x: x.score, reverse=True)
+        return list(self._candidates)
 
     def _is_state_changing(self, call_info: CallInfo) -> bool:
         """判断是否为状态修改函数"""
-        state_change_keywords = {
-            'deposit', 'withdraw', 'mint', 'burn', 'transfer',
-            'swap', 'borrow', 'repay', 'flash', 'bond', 'debond',
-            'stake', 'unstake', 'claim', 'liquidate'
-        }
-        return any(kw in call_info.function_name.lower() for kw in state_change_keywords)
+        return _STATE_CHANGE_RE.search(call_info.function_name) is not None
 
     def _infer_contract_name(self, address: str) -> str:
         """从变量声明推断合约名称"""
-        # 在AST中查找地址对应的变量名
-        for node in self._walk_ast(self.ast):
-            if node.get('nodeType') == 'VariableDeclaration':
-                value_node = node.get('value')
-                if value_node:
-                    addr = self._extract_literal_value(value_node)
-                    if addr and addr.lower() == address.lower():
-                        return node.get('name', 'Unknown')
-
-        return 'Unknown'
+        # 查预建的 地址->变量名 表
+        return self._address_names.get(address.lower(), 'Unknown')
 
     def extract_address_declarations(self) -> List[AddressDeclaration]:
         """
@@ -769,76 +1086,90 @@ class SolidityASTAnalyzer:
         Returns:
             List[AddressDeclaration]: 地址声明列表
         """
-        declarations = []
-
-        for node in self._walk_ast(self.ast):
-            if node.get('nodeType') != 'VariableDeclaration':
-                continue
+        declarations = list(self.iter_address_declarations())
+        logger.debug(f"提取到{len(declarations)}个地址声明")
+        return declarations
 
-            var_name = node.get('name')
-            if not var_name:
+    def iter_address_declarations(self) -> Iterator[AddressDeclaration]:
+        """惰性产出地址声明, 调用方可随时中止"""
+        for node in self._nodes_of_type('VariableDeclaration'):
+            declaration = self._address_declaration_from_node(node)
+            if declaration is not None:
+                yield declaration
+
+    def find_address_by_name(self, name: str) -> Optional[AddressDeclaration]:
+        """按变量名查找地址声明, 命中即返回, 不构造其他声明"""
+        for node in self._nodes_of_type('VariableDeclaration'):
+            if node.get('name') != name:
                 continue
+            declaration = self._address_declaration_from_node(node)
+            if declaration is not None:
+                return declaration
+        return None
 
-            # 获取类型信息
-            type_node = node.get('typeName', {})
-            type_name = type_node.get('name', '')  # 可能是address或接口名
-
-            # 检查是否为地址类型或自定义接口类型
-            is_address_type = (
-                type_name == 'address' or
-                type_name.startswith('I') or  # 接口命名约定
-                'contract' in type_node.get('nodeType', '').lower()
-            )
+    def _address_declaration_from_node(self, node: Dict) -> Optional[AddressDeclaration]:
+        """将单个VariableDeclaration节点解析为AddressDeclaration (非地址声明返回None)"""
+        var_name = node.get('name')
+        if not var_name:
+            return None
 
-            if not is_address_type:
-                continue
+        # 获取类型信息
+        type_node = node.get('typeName', {})
+        type_name = type_node.get('name', '')  # 可能是address或接口名
 
-            # 获取值节点
-            value_node = node.get('value')
-            if not value_node:
-                continue
+        # 检查是否为地址类型或自定义接口类型
+        is_address_type = (
+            type_name == 'address' or
+            type_name.startswith('I') or  # 接口命名约定
+            'contract' in type_node.get('nodeType', '').lower()
+        )
 
-            # 提取地址值(可能被类型转换包裹)
-            address_value = self._extract_address_from_value(value_node)
-            if not address_value:
-                continue
+        if not is_address_type:
+            return None
 
-            # 确保地址格式正确
-            if not address_value.startswith('0x'):
-                address_value = '0x' + address_value
+        # 获取值节点
+        value_node = node.get('value')
+        if not value_node:
+            return None
 
-            # 提取修饰符
-            is_constant = node.get('constant', False)
-            is_immutable = node.get('mutability') == 'immutable'
-            visibility = node.get('visibility', 'internal')
+        # 提取地址值(可能被类型转换包裹)
+        address_value = self._extract_address_from_value(value_node)
+        if not address_value:
+            return None
 
-            # 计算行号
-            src = node.get('src', '')
-            line_number = 0
-            if src:
-                try:
-                    offset = int(src.split(':')[0])
-                    line_number = self._offset_to_line(offset)
-                except:
-                    pass
+        # 确保地址格式正确
+        if not address_value.startswith('0x'):
+            address_value = '0x' + address_value
 
-            # 推断接口名
-            interface_name = None
-            if type_name and type_name != 'address':
-                interface_name = type_name
-
-            declarations.append(AddressDeclaration(
-                variable_name=var_name,
-                interface_name=interface_name,
-                address=address_value,
-                is_constant=is_constant,
-                is_immutable=is_immutable,
-                visibility=visibility,
-                line_number=line_number
-            ))
+        # 提取修饰符
+        is_constant = node.get('constant', False)
+        is_immutable = node.get('mutability') == 'immutable'
+        visibility = node.get('visibility', 'internal')
 
-        logger.debug(f"提取到{len(declarations)}个地址声明")
-        return declarations
+        # 计算行号
+        src = node.get('src', '')
+        line_number = 0
+        if src:
+            try:
+                offset = int(src.split(':')[0])
+                line_number = self._offset_to_line(offset)
+            except:
+                pass
+
+        # 推断接口名
+        interface_name = None
+        if type_name and type_name != 'address':
+            interface_name = type_name
+
+        return AddressDeclaration(
+            variable_name=var_name,
+            interface_name=interface_name,
+            address=address_value,
+            is_constant=is_constant,
+            is_immutable=is_immutable,
+            visibility=visibility,
+            line_number=line_number
+        )
 
     def _extract_address_from_value(self, value_node: Dict) -> Optional[str]:
         """
@@ -884,6 +1215,24 @@ class StateDiffAnalyzer:
         # 初始化Storage布局推断器
         self.layout_inferrer = None  # 延迟初始化
 
+        # 名称索引 (addresses_info被重新赋值时重建)
+        self._name_index: Dict[str, str] = {}  # 小写name/symbol/alias -> 地址
+        self._name_lower_pairs: List[Tuple[str, str]] = []  # (小写name/alias, 地址), 部分匹配用
+        self._partial_match_cache: Dict[str, Optional[str]] = {}  # 小写查询 -> 部分匹配结果
+        self._name_index_source: Optional[Dict] = None
+
+        # 小写地址 -> 状态文件中的原始地址键 (状态文件只在构造时加载一次)
+        self._addr_key_map_before = self._build_addr_key_map(self.state_before)
+        self._addr_key_map_after = self._build_addr_key_map(self.state_after)
+
+        # 按地址缓存的slot变化分析结果
+        self._slot_changes_cache: Dict[str, List[Dict]] = {}
+
+    def iter_address_keys(self) -> Iterator[str]:
+        """产出attack_state.json中的合约地址键 (状态文件缺失或损坏时为空)"""
+        if self.state_before:
+            yield from self.state_before.get('addresses', {})
+
     def _load_json(self, filename: str) -> Optional[Dict]:
         file_path = self.protocol_dir / filename
         if not file_path.exists():
@@ -895,8 +1244,8 @@ class StateDiffAnalyzer:
                 if filename == "addresses.json" and isinstance(data, list):
                     return {item['address'].lower(): item for item in data if 'address' in item}
                 return data
-        except Exception as e:
-            logger.warning(f"加载{filename}失败: {e}")
+        except (json.JSONDecodeError, UnicodeDecodeError, OSError) as e:
+            logger.error(f"加载{filename}失败: {e}")
             return None
 
     def _find_address_by_name(self, search_name: str) -> Optional[str]:
@@ -918,37 +1267,64 @@ class StateDiffAnalyzer:
         if not self.addresses_info:
             return None
 
+        self._ensure_name_index()
         search_lower = search_name.lower()
 
         # 第一轮: 精确匹配
-        for addr, info in self.addresses_info.items():
-            name = info.get('name', '')
-            if name and name.lower() == search_lower:
-                return addr
+        addr = self._name_index.get(search_lower)
+        if addr is not None:
+            return addr
+
+        # 第二轮: 部分匹配 (首个命中即返回; 结果按查询缓存, 含未命中)
+        if search_lower in self._partial_match_cache:
+            return self._partial_match_cache[search_lower]
+
+        match = next(
+            (addr for name_lower, addr in self._name_lower_pairs
+             if search_lower in name_lower or name_lower in search_lower),
+            None
+        )
+        self._partial_match_cache[search_lower] = match
+        return match
 
-            symbol = info.get('symbol', '')
-            if symbol and symbol.lower() == search_lower:
-                return addr
+    def _ensure_name_index(self):
+        """
+        为addresses_info建立名称索引, 每个名称只转换一次小写
 
-            aliases = info.get('aliases', [])
-            if aliases:
-                for alias in aliases:
-                    if alias and alias.lower() == search_lower:
-                        return addr
+        精确索引中同一名称以addresses_info中最先出现的地址为准;
+        部分匹配列表按 (地址顺序, name在aliases之前) 排列, 与逐条扫描的返回结果一致
+        """
+        if self._name_index_source is self.addresses_info:
+            return
 
-        # 第二轮: 部分匹配
+        name_index: Dict[str, str] = {}
+        name_lower_pairs: List[Tuple[str, str]] = []
         for addr, info in self.addresses_info.items():
             name = info.get('name', '')
-            if name and (search_lower in name.lower() or name.lower() in search_lower):
-                return addr
+            symbol = info.get('symbol', '')
+            aliases = info.get('aliases', []) or []
 
-            aliases = info.get('aliases', [])
-            if aliases:
-                for alias in aliases:
-                    if alias and (search_lower in alias.lower() or alias.lower() in search_lower):
-                        return addr
+            for candidate in (name, symbol, *aliases):
+                if candidate:
+                    name_index.setdefault(candidate.lower(), addr)
 
-        return None
+            for candidate in (name, *aliases):
+                if candidate:
+                    name_lower_pairs.append((candidate.lower(), addr))
+
+        self._name_index = name_index
+        self._name_lower_pairs = name_lower_pairs
+        self._partial_match_cache = {}
+        self._name_index_source = self.addresses_info
+
+    @staticmethod
+    def _build_addr_key_map(state: Optional[Dict]) -> Dict[str, str]:
+        """构建 小写地址 -> 原始地址键 的映射 (大小写重复时以首个为准)"""
+        key_map: Dict[str, str] = {}
+        if state:
+            for addr_key in state.get('addresses', {}):
+                key_map.setdefault(addr_key.lower(), addr_key)
+        return key_map
 
     def get_contract_storage(self, address: str, before: bool = True) -> Dict:
         """获取指定合约的storage"""
@@ -956,27 +1332,45 @@ class StateDiffAnalyzer:
         if not state:
             return {}
 
-        addresses = state.get('addresses', {})
-        for addr_key in addresses.keys():
-            if addr_key.lower() == address.lower():
-                return addresses[addr_key].get('storage', {})
-        return {}
+        key_map = self._addr_key_map_before if before else self._addr_key_map_after
+        addr_key = key_map.get(address.lower())
+        if addr_key is None:
+            return {}
+        return state['addresses'][addr_key].get('storage', {})
 
     def analyze_slot_changes(self, address: str) -> List[Dict]:
-        """分析合约的slot变化"""
+        """分析合约的slot变化 (按地址缓存, 布局推断中同一合约会被反复查询)"""
+        address_key = address.lower()
+        changes = self._slot_changes_cache.get(address_key)
+        if changes is None:
+            changes = self._slot_changes_cache[address_key] = self._compute_slot_changes(address)
+        return changes
+
+    def _compute_slot_changes(self, address: str) -> List[Dict]:
+        return sorted(self._collect_slot_changes(address), key=itemgetter('change_abs'), reverse=True)
+
+    def _collect_slot_changes(self, address: str) -> List[Dict]:
+        """逐slot比较前后storage, 返回未排序的变化列表"""
         storage_before = self.get_contract_storage(address, before=True)
         storage_after = self.get_contract_storage(address, before=False)
 
         if not storage_before or not storage_after:
             return []
 
-        all_slots = set(storage_before.keys()) | set(storage_after.keys())
+        # 只遍历可能变化的slot: 两侧都有且值不同的, 以及只出现在一侧的
+        common_changed = [
+            slot for slot, value in storage_before.items()
+            if slot in storage_after and storage_after[slot] != value
+        ]
+        removed = storage_before.keys() - storage_after.keys()
+        added = storage_after.keys() - storage_before.keys()
         changes = []
 
-        for slot in all_slots:
+        for slot in itertools.chain(common_changed, removed, added):
             val_before = storage_before.get(slot, '0x0')
             val_after = storage_after.get(slot, '0x0')
 
+            # 只出现在一侧且值为'0x0'的slot不算变化
             if val_before != val_after:
                 before_int = to_int(val_before)
                 after_int = to_int(val_after)
@@ -1004,7 +1398,23 @@ class StateDiffAnalyzer:
                     'is_cleared_slot': is_cleared_slot
                 })
 
-        return sorted(changes, key=lambda x: x['change_abs'], reverse=True)
+        return changes
+
+
+@lru_cache(maxsize=8192)
+def _to_slot_int(slot: str) -> Optional[int]:
+    """解析slot字符串 ('0x'前缀为十六进制, 否则十进制), 无法解析返回None"""
+    try:
+        return int(slot, 16) if slot.startswith('0x') else int(slot)
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+
+@lru_cache(maxsize=8192)
+def _slot_is_mapping(slot: str) -> bool:
+    """mapping派生slot是keccak结果, 数值远大于普通顺序slot"""
+    slot_int = _to_slot_int(slot)
+    return slot_int is not None and slot_int > 2**200
 
 
 class StorageLayoutInferrer:
@@ -1015,10 +1425,33 @@ class StorageLayoutInferrer:
         self.addresses_info = addresses_info or {}
         self.layout_cache: Dict[str, StorageLayout] = {}
 
+        # addresses.json以列表加载时键已是小写; 这里再建一层小写视图以兼容字典格式的原始键
+        self._info_by_addr: Dict[str, Dict] = {}
+        for addr, info in self.addresses_info.items():
+            self._info_by_addr.setdefault(addr.lower(), info)
+
+        # mapping slot反查表: 小写slot -> (base_slot, 地址key), 首次反查时构建
+        self._mapping_slot_table: Dict[str, Tuple[int, str]] = {}
+        self._mapping_slot_table_size = -1  # 构建时addresses_info的大小, 增长后重建
+
+        self._is_erc20_cache: Dict[str, bool] = {}
+
+        # 有storage变化的 (小写地址, 原始地址) (首次查找相关合约时计算) 及每个合约的相关合约列表
+        self._nonempty_addresses: Optional[List[Tuple[str, str]]] = None
+        self._related_cache: Dict[str, List[str]] = {}
+
+        # 每个合约的slot变化按 mapping派生slot / 普通slot 预先分组, 各判定只遍历相关子集
+        self._slot_partition_cache: Dict[str, Tuple[List[Dict], List[Dict]]] = {}
+
+        # 遇到无法解析的slot只报告一次, 避免日志刷屏
+        self._bad_slot_reported = False
+
     def infer_layout(self, contract_addr: str) -> StorageLayout:
-        """推断合约的storage布局"""
-        if contract_addr in self.layout_cache:
-            return self.layout_cache[contract_addr]
+        """推断合约的storage布局 (按小写地址缓存)"""
+        contract_lower = contract_addr.lower()
+        layout = self.layout_cache.get(contract_lower)
+        if layout is not None:
+            return layout
 
         layout = StorageLayout(contract_address=contract_addr)
 
@@ -1035,61 +1468,97 @@ class StorageLayoutInferrer:
         # 方法3: 基于跨合约关联推断
         self._infer_from_cross_contract_correlation(contract_addr, slot_changes, layout)
 
-        self.layout_cache[contract_addr] = layout
+        self.layout_cache[contract_lower] = layout
         return layout
 
     def _is_erc20_contract(self, contract_addr: str) -> bool:
-        """判断是否为ERC20合约"""
-        # 优先使用链上数据补全的 is_erc20 字段
-        if self.addresses_info:
-            for addr, info in self.addresses_info.items():
-                if addr.lower() == contract_addr.lower():
-                    # 1. 直接使用is_erc20字段(来自OnChainDataFetcher)
-                    is_erc20 = info.get('is_erc20')
-                    if is_erc20 is not None:
-                        return is_erc20
-
-                    # 2. 基于semantic_type判断
-                    semantic_type = info.get('semantic_type', '')
-                    if semantic_type in ['wrapped_token', 'erc20_token']:
-                        return True
-
-                    # 3. 基于symbol判断(如果有symbol则很可能是token)
-                    symbol = info.get('symbol')
-                    if symbol:
-                        return True
-
-                    # 4. 回退: 基于name关键词判断
-                    name = info.get('name', '').lower()
-                    keywords = ['token', 'coin', 'erc20', 'weth', 'wbtc', 'dai', 'usdc', 'usdt', 'barl']
-                    if any(kw in name for kw in keywords):
-                        return True
-
-        # 通过slot变化判断
-        slot_changes = self.state_analyzer.analyze_slot_changes(contract_addr)
+        """判断是否为ERC20合约 (按地址缓存)"""
+        contract_lower = contract_addr.lower()
+        result = self._is_erc20_cache.get(contract_lower)
+        if result is None:
+            # 优先使用链上数据补全的元数据, 元数据能下结论时不再分析storage变化
+            result = self._erc20_from_metadata(self._info_by_addr.get(contract_lower))
+            if result is None:
+                result = self._erc20_from_slot_changes(contract_addr)
+            self._is_erc20_cache[contract_lower] = result
+        return result
+
+    @staticmethod
+    def _erc20_from_metadata(info: Optional[Dict]) -> Optional[bool]:
+        """根据addresses.json元数据判断, 无法下结论时返回None"""
+        if info is None:
+            return None
+
+        # 1. 直接使用is_erc20字段(来自OnChainDataFetcher)
+        is_erc20 = info.get('is_erc20')
+        if is_erc20 is not None:
+            return is_erc20
+
+        # 2. 基于semantic_type判断
+        semantic_type = info.get('semantic_type', '')
+        if semantic_type in ['wrapped_token', 'erc20_token']:
+            return True
+
+        # 3. 基于symbol判断(如果有symbol则很可能是token)
+        symbol = info.get('symbol')
+        if symbol:
+            return True
+
+        # 4. 回退: 基于name关键词判断
+        name = info.get('name', '').lower()
+        keywords = ['token', 'coin', 'erc20', 'weth', 'wbtc', 'dai', 'usdc', 'usdt', 'barl']
+        if any(kw in name for kw in keywords):
+            return True
+
+        return None
+
+    def _erc20_from_slot_changes(self, contract_addr: str) -> bool:
+        """通过slot变化判断: 有类似totalSupply的普通slot且有mapping slot变化"""
+        mapping_changes, plain_changes = self._partition_slot_changes(contract_addr)
         has_supply_like = any(
             10**18 <= abs(c['before']) <= 10**30 or 10**18 <= abs(c['after']) <= 10**30
-            for c in slot_changes if not self._is_mapping_slot(c['slot'])
+            for c in plain_changes
         )
         # 降低阈值:至少有1个mapping slot即可
-        has_mappings = sum(1 for c in slot_changes if self._is_mapping_slot(c['slot'])) >= 1
+        has_mappings = len(mapping_changes) >= 1
 
         return has_supply_like and has_mappings
 
+    def _partition_slot_changes(self, contract_addr: str) -> Tuple[List[Dict], List[Dict]]:
+        """
+        将合约的slot变化一次性分为 (mapping派生slot变化, 普通slot变化) 两组并缓存
+
+        存储值可达256位, 无法放进NumPy定长整型数组做向量化掩码;
+        这里改为只解析一次slot并分组, 各判定只遍历自己关心的子集。两组内部保持原有排序。
+        """
+        key = contract_addr.lower()
+        partition = self._slot_partition_cache.get(key)
+        if partition is None:
+            mapping_changes: List[Dict] = []
+            plain_changes: List[Dict] = []
+            for change in self.state_analyzer.analyze_slot_changes(contract_addr):
+                if self._is_mapping_slot(change['slot']):
+                    mapping_changes.append(change)
+                else:
+                    plain_changes.append(change)
+            partition = self._slot_partition_cache[key] = (mapping_changes, plain_changes)
+        return partition
+
     def _infer_erc20_slots(self, contract_addr: str, slot_changes: List[Dict], layout: StorageLayout):
         """推断ERC20合约的关键slot"""
 
+        mapping_changes, plain_changes = self._partition_slot_changes(contract_addr)
+
         # 1. 识别totalSupply slot
         supply_candidates = []
-        for change in slot_changes:
+        for change in plain_changes:
             slot = change['slot']
-            if not self._is_mapping_slot(slot):
-                value_before = change['before']
-                value_after = change['after']
+            value_before = change['before']
+            value_after = change['after']
 
-                if 10**18 <= value_before <= 10**30 or 10**18 <= value_after <= 10**30:
-                    confidence = self._verify_supply_hypothesis(contract_addr, slot, change)
-                    supply_candidates.append((slot, confidence))
+            if 10**18 <= value_before <= 10**30 or 10**18 <= value_after <= 10**30:
+                confidence = self._verify_supply_hypothesis(contract_addr, slot, change)
+                supply_candidates.append((slot, confidence))
 
         if supply_candidates:
             best_slot = max(supply_candidates, key=lambda x: x[1])[0]
@@ -1097,19 +1566,18 @@ class StorageLayoutInferrer:
 
         # 2. 识别balances mapping
         balance_slots = []
-        for change in slot_changes:
+        for change in mapping_changes:
             slot = change['slot']
-            if self._is_mapping_slot(slot):
-                base_slot, key = self._reverse_mapping_slot(contract_addr, slot, change)
-                if base_slot is not None:
-                    found = False
-                    for idx, (bs, name, keys) in enumerate(balance_slots):
-                        if bs == base_slot:
-                            balance_slots[idx] = (bs, name, keys + [key])
-                            found = True
-                            break
-                    if not found:
-                        balance_slots.append((base_slot, 'balances', [key]))
+            base_slot, key = self._reverse_mapping_slot(contract_addr, slot, change)
+            if base_slot is not None:
+                found = False
+                for idx, (bs, name, keys) in enumerate(balance_slots):
+                    if bs == base_slot:
+                        balance_slots[idx] = (bs, name, keys + [key])
+                        found = True
+                        break
+                if not found:
+                    balance_slots.append((base_slot, 'balances', [key]))
 
         if balance_slots:
             best_mapping = max(balance_slots, key=lambda x: len(x[2]))
@@ -1120,19 +1588,25 @@ class StorageLayoutInferrer:
         """尝试反推mapping的base slot和key"""
         # 标准化slot_hash为hex格式
         if not slot_hash.startswith('0x'):
-            slot_hash_hex = hex(int(slot_hash))
+            slot_hash_hex = hex(_to_slot_int(slot_hash))
         else:
             slot_hash_hex = slot_hash
 
-        # 遍历可能的base slot（0-20）
-        for base_slot in range(20):
-            # 遍历addresses.json中的所有地址作为候选key
-            for addr in self.addresses_info.keys():
-                computed_slot = compute_mapping_slot(addr, base_slot)
-                if computed_slot.lower() == slot_hash_hex.lower():
-                    return (base_slot, addr)
+        table = self._get_mapping_slot_table()
+        return table.get(slot_hash_hex.lower(), (None, None))
+
+    def _get_mapping_slot_table(self) -> Dict[str, Tuple[int, str]]:
+        """
+        预计算 addresses.json中所有地址 x base slot(0-19) 的mapping slot反查表
+
+        每个 (地址, base_slot) 只做一次keccak; 同一slot保留 (base_slot, 地址顺序) 上最先出现的组合
+        """
+        if self._mapping_slot_table_size != len(self.addresses_info):
+            candidate_keys = list(self.addresses_info.keys())
+            self._mapping_slot_table = _build_mapping_slot_table(candidate_keys, list(range(20)))
+            self._mapping_slot_table_size = len(candidate_keys)
 
-        return (None, None)
+        return self._mapping_slot_table
 
     def _verify_supply_hypothesis(self, contract_addr: str, slot: str, change: Dict) -> float:
         """验证totalSupply假设的置信度"""
@@ -1160,7 +1634,8 @@ class StorageLayoutInferrer:
         # 简化实现：返回最大的变化量作为估计
         slot_changes = self.state_analyzer.analyze_slot_changes(contract_addr)
         if slot_changes:
-            total = max(c['change_abs'] for c in slot_changes if self._is_mapping_slot(c['slot']))
+            mapping_changes, _ = self._partition_slot_changes(contract_addr)
+            total = max((c['change_abs'] for c in mapping_changes), default=0)
 
         return total
 
@@ -1208,17 +1683,18 @@ class StorageLayoutInferrer:
                                               confidence=correlation)
 
     def _find_related_contracts(self, contract_addr: str) -> List[str]:
-        """查找相关合约"""
-        related = []
-
-        for addr in self.addresses_info.keys():
-            if addr.lower() == contract_addr.lower():
-                continue
-
-            # 检查是否都有storage变化
-            if self.state_analyzer.analyze_slot_changes(addr):
-                related.append(addr)
-
+        """查找相关合约 (其余有storage变化的地址)"""
+        contract_lower = contract_addr.lower()
+        related = self._related_cache.get(contract_lower)
+        if related is None:
+            if self._nonempty_addresses is None:
+                self._nonempty_addresses = [
+                    (addr.lower(), addr) for addr in self.addresses_info.keys()
+                    if self.state_analyzer.analyze_slot_changes(addr)
+                ]
+            related = self._related_cache[contract_lower] = [
+                addr for addr_lower, addr in self._nonempty_addresses if addr_lower != contract_lower
+            ]
         return related
 
     def _compute_change_correlation(self, change1: Dict, change2: Dict) -> float:
@@ -1248,31 +1724,39 @@ class StorageLayoutInferrer:
         name2 = info2.get('name', '').lower()
 
         if 'pair' in name1 or 'pool' in name1:
-            if 'reserve' not in [v.name for v in layout_cache.get(addr1, StorageLayout(addr1)).variables.values()]:
+            # 已推断过的布局中已有reserve时不再重复标注 (尚未缓存时视为没有)
+            cached_layout = self.layout_cache.get(addr1.lower())
+            if cached_layout is None or all(v.name != 'reserve' for v in cached_layout.variables.values()):
                 return 'reserve'
 
         return None
 
     def _is_mapping_slot(self, slot: str) -> bool:
         """判断slot是否为mapping的派生slot"""
-        try:
-            slot_int = int(slot, 16) if slot.startswith('0x') else int(slot)
-            return slot_int > 2**200
-        except:
-            return False
+        if not self._bad_slot_reported and _to_slot_int(slot) is None:
+            self._bad_slot_reported = True
+            logger.error(f"无法解析的slot: {slot!r}, 按普通slot处理 (后续同类错误不再提示)")
+        return _slot_is_mapping(slot)
 
 
 # =============================================================================
 # 改进3: Symbolic Execution Parameter Evaluator
 # =============================================================================
 
+# UniswapV2 slot 8打包布局: reserve0(uint112) | reserve1(uint112) | blockTimestampLast(uint32)
+_RESERVES_MASK112 = (1 << 112) - 1
+_RESERVES_MASK32 = (1 << 32) - 1
+
+
 class ContractProxy:
     """合约代理 - 从状态数据中读取合约状态"""
 
     def __init__(self, address: str, state_analyzer: StateDiffAnalyzer):
         self.address = address
         self.state_analyzer = state_analyzer
-        self.storage = state_analyzer.get_contract_storage(address, before=True)
+        # 状态文件中普通slot是十进制键, 计算出的mapping slot是十六进制, 统一为'0x'小写十六进制后再查找
+        storage = state_analyzer.get_contract_storage(address, before=True)
+        self.storage = {self._norm_slot(k): v for k, v in storage.items()}
 
         # 尝试推断合约类型
         if state_analyzer.layout_inferrer:
@@ -1280,6 +1764,17 @@ class ContractProxy:
         else:
             self.layout = StorageLayout(contract_address=address)
 
+        # balances mapping的base slot (layout中没有时为None)
+        self._balances_base_slot: Optional[int] = next(
+            (m.base_slot for m in self.layout.mappings.values() if m.name == 'balances'), None
+        )
+
+    @staticmethod
+    def _norm_slot(slot: str) -> str:
+        """将slot键规范化为'0x'前缀的小写十六进制 (无前导零), 无法解析的键原样小写"""
+        slot_int = _to_slot_int(slot)
+        return hex(slot_int) if slot_int is not None else slot.lower()
+
     def call(self, method_name: str, *args) -> Any:
         """模拟合约方法调用"""
 
@@ -1304,17 +1799,12 @@ class ContractProxy:
         if not holder_address:
             return 0
 
-        # 从layout获取balances mapping的base slot
-        for mapping in self.layout.mappings.values():
-            if mapping.name == 'balances':
-                slot = compute_mapping_slot(holder_address, mapping.base_slot)
-                if slot in self.storage:
-                    return to_int(self.storage[slot])
-
-        # 回退：尝试常见的slot 0
-        slot = compute_mapping_slot(holder_address, 0)
-        if slot in self.storage:
-            return to_int(self.storage[slot])
+        # 优先使用layout中balances mapping的base slot, 回退到常见的slot 0
+        base_slots = (0,) if self._balances_base_slot in (None, 0) else (self._balances_base_slot, 0)
+        for base_slot in base_slots:
+            slot = self._norm_slot(compute_mapping_slot(holder_address, base_slot))
+            if slot in self.storage:
+                return to_int(self.storage[slot])
 
         return 0
 
@@ -1323,26 +1813,25 @@ class ContractProxy:
         # 从layout获取totalSupply的slot
         for var in self.layout.variables.values():
             if var.name == 'totalSupply':
-                slot = var.slot
+                slot = self._norm_slot(var.slot)
                 if slot in self.storage:
                     return to_int(self.storage[slot])
 
         # 回退：尝试常见的slot 2
-        if '2' in self.storage:
-            return to_int(self.storage['2'])
+        if '0x2' in self.storage:
+            return to_int(self.storage['0x2'])
 
         return 0
 
     def _getReserves(self) -> Tuple[int, int, int]:
         """读取Uniswap pair reserves"""
         # Uniswap V2的reserves通常在slot 8
-        if '8' in self.storage:
-            value = to_int(self.storage['8'])
+        if '0x8' in self.storage:
+            value = to_int(self.storage['0x8'])
             # reserves打包在一个slot中
-            reserve0 = value & ((1 << 112) - 1)
-            reserve1 = (value >> 112) & ((1 << 112) - 1)
-            timestamp = (value >> 224) & ((1 << 32) - 1)
-            return (reserve0, reserve1, timestamp)
+            return (value & _RESERVES_MASK112,
+                    (value >> 112) & _RESERVES_MASK112,
+                    (value >> 224) & _RESERVES_MASK32)
 
         return (0, 0, 0)
 
@@ -1357,6 +1846,36 @@ class BoundMethod:
         return self.obj.call(self.method_name, *args)
 
 
+# 运算符分派表 (Solidity运算符 -> Python实现), '/'为整数除法
+_BINARY_OPS = {
+    # 算术运算
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.floordiv,
+    '%': operator.mod,
+    '**': operator.pow,
+    '<<': operator.lshift,
+    '>>': operator.rshift,
+    # 比较运算
+    '<': operator.lt,
+    '>': operator.gt,
+    '<=': operator.le,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+    # 逻辑运算
+    '&&': lambda left, right: left and right,
+    '||': lambda left, right: left or right,
+}
+
+_UNARY_OPS = {
+    '-': operator.neg,
+    '+': operator.pos,
+    '!': operator.not_,
+}
+
+
 class SymbolicParameterEvaluator:
     """参数表达式符号执行求值器"""
 
@@ -1364,10 +1883,27 @@ class SymbolicParameterEvaluator:
         self.ast_analyzer = ast_analyzer
         self.state_analyzer = state_analyzer
         self.variable_env: Dict[str, Any] = {}
+
+        # nodeType -> 求值方法
+        self._dispatch = {
+            'Literal': self._parse_literal,
+            'Identifier': self._evaluate_identifier,
+            'BinaryOperation': self._evaluate_binary_op,
+            'UnaryOperation': self._evaluate_unary_op,
+            'FunctionCall': self._evaluate_function_call,
+            'MemberAccess': self._evaluate_member_access,
+            'IndexAccess': self._evaluate_index_access,
+        }
+
+        self._env_built = False
         self._build_environment()
 
     def _build_environment(self):
-        """构建执行环境"""
+        """构建执行环境 (只构建一次, 重复调用直接返回)"""
+        if self._env_built:
+            return
+        self._env_built = True
+
         # 1. 从addresses.json获取合约地址映射
         if self.state_analyzer.addresses_info:
             for addr, info in self.state_analyzer.addresses_info.items():
@@ -1377,17 +1913,16 @@ class SymbolicParameterEvaluator:
 
         # 2. 从AST获取常量定义
         if self.ast_analyzer:
-            for node in self.ast_analyzer._walk_ast(self.ast_analyzer.ast):
-                if node.get('nodeType') == 'VariableDeclaration':
-                    if node.get('constant') or node.get('immutable'):
-                        name = node.get('name', '')
-                        value_node = node.get('value')
-                        if value_node:
-                            try:
-                                value = self._evaluate_ast_node(value_node)
-                                self.variable_env[name] = value
-                            except:
-                                pass
+            const_decls = [
+                node for node in self.ast_analyzer._nodes_of_type('VariableDeclaration')
+                if (node.get('constant') or node.get('immutable')) and node.get('value')
+            ]
+            for node in const_decls:
+                try:
+                    self.variable_env[node.get('name', '')] = self._evaluate_ast_node(node['value'])
+                except (KeyError, ValueError, TypeError, AttributeError, ArithmeticError):
+                    # 无法静态求值的常量 (依赖运行时状态等) 直接跳过
+                    pass
 
     def evaluate(self, param_info: ParamInfo) -> Optional[int]:
         """求值参数表达式"""
@@ -1401,43 +1936,20 @@ class SymbolicParameterEvaluator:
             return None
 
     def _evaluate_ast_node(self, node: Dict) -> Any:
-        """递归求值AST节点"""
+        """递归求值AST节点 (按nodeType分派)"""
         node_type = node.get('nodeType', '')
+        handler = self._dispatch.get(node_type)
+        if handler is None:
+            raise ValueError(f"不支持的节点类型: {node_type}")
+        return handler(node)
 
-        # 字面量
-        if node_type == 'Literal':
-            return self._parse_literal(node)
-
-        # 标识符
-        elif node_type == 'Identifier':
-            var_name = node.get('name', '')
-            if var_name in self.variable_env:
-                return self.variable_env[var_name]
-            else:
-                raise ValueError(f"未知变量: {var_name}")
-
-        # 二元运算
-        elif node_type == 'BinaryOperation':
-            return self._evaluate_binary_op(node)
-
-        # 一元运算
-        elif node_type == 'UnaryOperation':
-            return self._evaluate_unary_op(node)
-
-        # 函数调用
-        elif node_type == 'FunctionCall':
-            return self._evaluate_function_call(node)
-
-        # 成员访问
-        elif node_type == 'MemberAccess':
-            return self._evaluate_member_access(node)
-
-        # 索引访问
-        elif node_type == 'IndexAccess':
-            return self._evaluate_index_access(node)
-
+    def _evaluate_identifier(self, node: Dict) -> Any:
+        """求值标识符"""
+        var_name = node.get('name', '')
+        if var_name in self.variable_env:
+            return self.variable_env[var_name]
         else:
-            raise ValueError(f"不支持的节点类型: {node_type}")
+            raise ValueError(f"未知变量: {var_name}")
 
     def _evaluate_binary_op(self, node: Dict) -> Any:
         """求值二元运算"""
@@ -1445,60 +1957,20 @@ class SymbolicParameterEvaluator:
         left = self._evaluate_ast_node(node.get('leftExpression', {}))
         right = self._evaluate_ast_node(node.get('rightExpression', {}))
 
-        # 算术运算
-        if operator == '+':
-            return left + right
-        elif operator == '-':
-            return left - right
-        elif operator == '*':
-            return left * right
-        elif operator == '/':
-            return left // right
-        elif operator == '%':
-            return left % right
-        elif operator == '**':
-            return left ** right
-        elif operator == '<<':
-            return left << right
-        elif operator == '>>':
-            return left >> right
-
-        # 比较运算
-        elif operator == '<':
-            return left < right
-        elif operator == '>':
-            return left > right
-        elif operator == '<=':
-            return left <= right
-        elif operator == '>=':
-            return left >= right
-        elif operator == '==':
-            return left == right
-        elif operator == '!=':
-            return left != right
-
-        # 逻辑运算
-        elif operator == '&&':
-            return left and right
-        elif operator == '||':
-            return left or right
-
-        else:
+        func = _BINARY_OPS.get(operator)
+        if func is None:
             raise ValueError(f"不支持的运算符: {operator}")
+        return func(left, right)
 
     def _evaluate_unary_op(self, node: Dict) -> Any:
         """求值一元运算"""
         operator = node.get('operator', '')
         sub_expr = self._evaluate_ast_node(node.get('subExpression', {}))
 
-        if operator == '-':
-            return -sub_expr
-        elif operator == '+':
-            return +sub_expr
-        elif operator == '!':
-            return not sub_expr
-        else:
+        func = _UNARY_OPS.get(operator)
+        if func is None:
             raise ValueError(f"不支持的一元运算符: {operator}")
+        return func(sub_expr)
 
     def _evaluate_function_call(self, node: Dict) -> Any:
         """求值函数调用"""
@@ -1559,19 +2031,32 @@ class SymbolicParameterEvaluator:
             raise ValueError(f"无法索引 {type(base)}")
 
     def _parse_literal(self, node: Dict) -> Any:
-        """解析字面量"""
+        """解析字面量 (结果缓存在节点的'_cached_value'上, 重复求值时直接返回)"""
+        if '_cached_value' in node:
+            return node['_cached_value']
+
+        value = self._parse_literal_value(node)
+        node['_cached_value'] = value
+        return value
+
+    def _parse_literal_value(self, node: Dict) -> Any:
         kind = node.get('kind', '')
         value_str = node.get('value', '')
 
         if kind == 'number':
+            if '_' in value_str:
+                value_str = value_str.replace('_', '')
+
+            # 十六进制字面量 (其中的e/E是数字而非指数)
+            if value_str.startswith(('0x', '0X')):
+                return int(value_str, 16)
+
             # 处理科学计数法
-            if 'e' in value_str.lower():
-                parts = value_str.lower().split('e')
-                base = int(parts[0].replace('_', ''))
-                exponent = int(parts[1])
-                return base * (10 ** exponent)
+            if 'e' in value_str or 'E' in value_str:
+                base, exponent = value_str.replace('E', 'e').split('e')
+                return int(base) * (10 ** int(exponent))
             else:
-                return int(value_str.replace('_', ''), 0)
+                return int(value_str, 0)
 
         elif kind == 'string':
             return value_str
@@ -1607,7 +2092,49 @@ class SymbolicParameterEvaluator:
 # 主函数
 # =============================================================================
 
+# 测试模式: 命令行开关 -> 标题
+_TEST_MODES = {
+    '--test-ast': "=== 测试AST解析 ===",
+    '--test-layout': "=== 测试Storage布局推断 ===",
+    '--test-eval': "=== 测试参数求值 ===",
+}
+
+
+def _parse_test_argv(argv: List[str]) -> Optional[Tuple[str, str, str]]:
+    """
+    快速解析批量脚本最常用的调用形式, 不构造argparse解析器:
+        --test-xxx --protocol <name> --year-month <ym>  (两个选项顺序任意)
+
+    Returns:
+        (测试开关, protocol, year_month); 不是该形式时返回None, 由argparse处理
+    """
+    if len(argv) != 5 or argv[0] not in _TEST_MODES:
+        return None
+    options = {argv[1]: argv[2], argv[3]: argv[4]}
+    if options.keys() != {'--protocol', '--year-month'}:
+        return None
+    return argv[0], options['--protocol'], options['--year-month']
+
+
+def _run_test_mode(flag: str, repo_root: Path, protocol: str, year_month: str):
+    test_funcs = {
+        '--test-ast': test_ast_parsing,
+        '--test-layout': test_layout_inference,
+        '--test-eval': test_parameter_evaluation,
+    }
+    logger.info(_TEST_MODES[flag])
+    test_funcs[flag](repo_root, protocol, year_month)
+
+
 def main():
+    repo_root = Path(__file__).parent
+
+    # 快速路径: 单个测试模式的固定调用形式
+    fast_args = _parse_test_argv(sys.argv[1:])
+    if fast_args is not None:
+        _run_test_mode(fast_args[0], repo_root, fast_args[1], fast_args[2])
+        return
+
     parser = argparse.ArgumentParser(
         description="参数-状态约束提取器 V3 - 基于AST、动态布局推断、符号执行",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -1637,23 +2164,14 @@ V3改进:
 
     args = parser.parse_args()
 
-    repo_root = Path(__file__).parent
-
     # 测试模式
-    if args.test_ast and args.protocol and args.year_month:
-        logger.info("=== 测试AST解析 ===")
-        test_ast_parsing(repo_root, args.protocol, args.year_month)
-        return
-
-    if args.test_layout and args.protocol and args.year_month:
-        logger.info("=== 测试Storage布局推断 ===")
-        test_layout_inference(repo_root, args.protocol, args.year_month)
-        return
-
-    if args.test_eval and args.protocol and args.year_month:
-        logger.info("=== 测试参数求值 ===")
-        test_parameter_evaluation(repo_root, args.protocol, args.year_month)
-        return
+    if args.protocol and args.year_month:
+        for flag, enabled in (('--test-ast', args.test_ast),
+                              ('--test-layout', args.test_layout),
+                              ('--test-eval', args.test_eval)):
+            if enabled:
+                _run_test_mode(flag, repo_root, args.protocol, args.year_month)
+                return
 
     logger.error("V3完整集成正在开发中")
     logger.info("当前可用测试模式:")
@@ -1662,6 +2180,59 @@ V3改进:
     logger.info("  --test-eval: 测试参数求值")
 
 
+# addresses_info中缺失条目的只读占位, 避免每次查找未命中都分配空字典
+_EMPTY_INFO: Dict = {}
+
+# 进程内复用的分析器: 批量模式下同一协议的多个测试模式只解析一次AST/状态文件
+_ANALYZER_CACHE: Dict[Tuple[str, int], SolidityASTAnalyzer] = {}
+_STATE_ANALYZER_CACHE: Dict[Tuple[str, Tuple[Optional[int], ...]], StateDiffAnalyzer] = {}
+_STATE_FILES = ("attack_state.json", "attack_state_after.json", "addresses.json")
+
+
+def _get_ast_analyzer(script_path: Path, repo_root: Path) -> SolidityASTAnalyzer:
+    """按 (脚本路径, mtime) 复用AST分析器; 脚本修改后重新解析, 解析失败的不缓存"""
+    path_key = str(script_path.resolve())
+    key = (path_key, script_path.stat().st_mtime_ns)
+    analyzer = _ANALYZER_CACHE.get(key)
+    if analyzer is None:
+        analyzer = SolidityASTAnalyzer(script_path, repo_root)
+        if analyzer.ast is not None:
+            for stale_key in [k for k in _ANALYZER_CACHE if k[0] == path_key]:
+                del _ANALYZER_CACHE[stale_key]
+            _ANALYZER_CACHE[key] = analyzer
+    return analyzer
+
+
+def _get_state_analyzer(protocol_dir: Path) -> StateDiffAnalyzer:
+    """
+    按 (协议目录, 各状态文件mtime) 复用状态分析器, 并确保已挂载布局推断器
+
+    状态文件重新生成后重新加载; attack_state.json加载失败的不缓存
+    """
+    path_key = str(protocol_dir.resolve())
+    mtimes = []
+    for filename in _STATE_FILES:
+        try:
+            mtimes.append((protocol_dir / filename).stat().st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    key = (path_key, tuple(mtimes))
+
+    state_analyzer = _STATE_ANALYZER_CACHE.get(key)
+    if state_analyzer is None:
+        state_analyzer = StateDiffAnalyzer(protocol_dir)
+        if state_analyzer.state_before:
+            for stale_key in [k for k in _STATE_ANALYZER_CACHE if k[0] == path_key]:
+                del _STATE_ANALYZER_CACHE[stale_key]
+            _STATE_ANALYZER_CACHE[key] = state_analyzer
+    if state_analyzer.layout_inferrer is None:
+        state_analyzer.layout_inferrer = StorageLayoutInferrer(
+            state_analyzer,
+            state_analyzer.addresses_info
+        )
+    return state_analyzer
+
+
 def test_ast_parsing(repo_root: Path, protocol: str, year_month: str):
     """测试AST解析功能"""
     script_path = repo_root / "src" / "test" / year_month / f"{protocol}.sol"
@@ -1671,20 +2242,20 @@ def test_ast_parsing(repo_root: Path, protocol: str, year_month: str):
         return
 
     try:
-        analyzer = SolidityASTAnalyzer(script_path, repo_root)
+        analyzer = _get_ast_analyzer(script_path, repo_root)
 
         logger.success("AST获取成功")
-        logger.info(f"  AST节点数: {len(analyzer._walk_ast(analyzer.ast))}")
+        logger.info(f"  AST节点数: {analyzer.node_count}")
 
         # 识别被攻击合约
         candidates = analyzer.identify_vulnerable_contracts()
 
         logger.info(f"\n识别到 {len(candidates)} 个候选被攻击合约:")
         for i, contract in enumerate(candidates[:5], 1):
-            logger.info(f"  {i}. {contract.name} ({contract.address})")
-            logger.info(f"     - 调用次数: {contract.call_count}")
-            logger.info(f"     - 函数: {', '.join(contract.functions)}")
-            logger.info(f"     - 评分: {contract.score:.1f}")
+            logger.info("  %d. %s (%s)", i, contract.name, contract.address)
+            logger.info("     - 调用次数: %d", contract.call_count)
+            logger.info("     - 函数: %s", ', '.join(contract.functions))
+            logger.info("     - 评分: %.1f", contract.score)
 
         # 显示函数调用
         if candidates:
@@ -1693,14 +2264,12 @@ def test_ast_parsing(repo_root: Path, protocol: str, year_month: str):
             logger.info(f"\n{best.name} 的函数调用:")
             for call in calls[:10]:
                 loop_info = f" [循环{call.loop_context.count}次]" if call.loop_context else ""
-                logger.info(f"  Line {call.line_number}: {call.function_name}(...){loop_info}")
+                logger.info("  Line %s: %s(...)%s", call.line_number, call.function_name, loop_info)
                 for param in call.parameters[:3]:
-                    logger.info(f"    - {param.expression} ({param.type})")
+                    logger.info("    - %s (%s)", param.expression, param.type)
 
     except Exception as e:
-        logger.error(f"AST解析失败: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"AST解析失败: {e}")
 
 
 def test_layout_inference(repo_root: Path, protocol: str, year_month: str):
@@ -1712,60 +2281,49 @@ def test_layout_inference(repo_root: Path, protocol: str, year_month: str):
         return
 
     try:
-        state_analyzer = StateDiffAnalyzer(protocol_dir)
+        state_analyzer = _get_state_analyzer(protocol_dir)
 
         if not state_analyzer.state_before:
             logger.error("attack_state.json不存在")
             return
 
-        # 初始化布局推断器
-        state_analyzer.layout_inferrer = StorageLayoutInferrer(
-            state_analyzer,
-            state_analyzer.addresses_info
-        )
-
         # 分析所有有变化的合约
-        addresses = state_analyzer.state_before.get('addresses', {})
+        addresses = list(state_analyzer.iter_address_keys())
         logger.info(f"分析 {len(addresses)} 个合约的storage布局:\n")
 
-        # 优先分析有名称的合约
-        named_addresses = [
-            addr for addr in addresses.keys()
-            if state_analyzer.addresses_info.get(addr.lower(), {}).get('name') is not None
-        ]
-        other_addresses = [
-            addr for addr in addresses.keys()
-            if state_analyzer.addresses_info.get(addr.lower(), {}).get('name') is None
-        ]
+        # 优先分析有名称的合约 (一次遍历完成分组)
+        named_addresses, other_addresses = [], []
+        addresses_info = state_analyzer.addresses_info
+        for addr in addresses:
+            info = addresses_info.get(addr.lower()) or _EMPTY_INFO
+            (named_addresses if info.get('name') is not None else other_addresses).append((addr, info))
 
         # 优先处理有名称的前10个,然后是其他的前5个
-        for addr in (named_addresses[:10] + other_addresses[:5]):
+        for addr, info in itertools.chain(named_addresses[:10], other_addresses[:5]):
             slot_changes = state_analyzer.analyze_slot_changes(addr)
             if not slot_changes:
                 continue
 
-            name = state_analyzer.addresses_info.get(addr.lower(), {}).get('name', 'Unknown')
-            logger.info(f"合约: {name} ({addr})")
-            logger.info(f"  Slot变化数: {len(slot_changes)}")
+            name = info.get('name', 'Unknown')
+            logger.info("合约: %s (%s)", name, addr)
+            logger.info("  Slot变化数: %d", len(slot_changes))
 
             # 推断布局
             layout = state_analyzer.layout_inferrer.infer_layout(addr)
 
-            logger.info(f"  推断的变量:")
+            logger.info("  推断的变量:")
             for slot, var in layout.variables.items():
-                logger.info(f"    slot {slot}: {var.name} ({var.type}) - 置信度{var.confidence:.2f}")
+                logger.info("    slot %s: %s (%s) - 置信度%.2f", slot, var.name, var.type, var.confidence)
 
-            logger.info(f"  推断的mapping:")
+            logger.info("  推断的mapping:")
             for base_slot, mapping in layout.mappings.items():
-                logger.info(f"    slot {base_slot}: {mapping.name} ({mapping.key_type}=>{mapping.value_type})")
-                logger.info(f"      已知keys: {len(mapping.known_keys)}个")
+                logger.info("    slot %s: %s (%s=>%s)", base_slot, mapping.name, mapping.key_type, mapping.value_type)
+                logger.info("      已知keys: %d个", len(mapping.known_keys))
 
             logger.info("")
 
     except Exception as e:
-        logger.error(f"布局推断失败: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"布局推断失败: {e}")
 
 
 def test_parameter_evaluation(repo_root: Path, protocol: str, year_month: str):
@@ -1779,7 +2337,7 @@ def test_parameter_evaluation(repo_root: Path, protocol: str, year_month: str):
 
     try:
         # 1. AST解析
-        ast_analyzer = SolidityASTAnalyzer(script_path, repo_root)
+        ast_analyzer = _get_ast_analyzer(script_path, repo_root)
         candidates = ast_analyzer.identify_vulnerable_contracts()
 
         if not candidates:
@@ -1787,11 +2345,7 @@ def test_parameter_evaluation(repo_root: Path, protocol: str, year_month: str):
             return
 
         # 2. 状态分析
-        state_analyzer = StateDiffAnalyzer(protocol_dir)
-        state_analyzer.layout_inferrer = StorageLayoutInferrer(
-            state_analyzer,
-            state_analyzer.addresses_info
-        )
+        state_analyzer = _get_state_analyzer(protocol_dir)
 
         # 3. 符号执行求值
         evaluator = SymbolicParameterEvaluator(ast_analyzer, state_analyzer)
@@ -1799,7 +2353,7 @@ def test_parameter_evaluation(repo_root: Path, protocol: str, year_month: str):
         logger.info(f"变量环境: {len(evaluator.variable_env)} 个变量")
         for name in list(evaluator.variable_env.keys())[:10]:
             obj = evaluator.variable_env[name]
-            logger.info(f"  {name}: {type(obj).__name__}")
+            logger.info("  %s: %s", name, type(obj).__name__)
 
         # 4. 求值参数
         best_contract = candidates[0]
@@ -1808,20 +2362,18 @@ def test_parameter_evaluation(repo_root: Path, protocol: str, year_month: str):
         logger.info(f"\n对 {best_contract.name} 的函数调用进行参数求值:\n")
 
         for call in calls[:5]:
-            logger.info(f"函数: {call.function_name}")
+            logger.info("函数: %s", call.function_name)
             for param in call.parameters:
-                logger.info(f"  表达式: {param.expression}")
+                logger.info("  表达式: %s", param.expression)
                 value = evaluator.evaluate(param)
                 if value is not None:
                     logger.success(f"  求值结果: {value:,} (0x{value:x})")
                 else:
-                    logger.warning(f"  求值失败")
+                    logger.warning("  求值失败")
             logger.info("")
 
     except Exception as e:
-        logger.error(f"参数求值测试失败: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"参数求值测试失败: {e}")
 
 
 if __name__ == "__main__":
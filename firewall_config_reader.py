@@ -13,19 +13,54 @@
 
 import json
 import logging
+import os
+import sys
 from pathlib import Path
-from typing import Dict, List, Optional, Set
-from dataclasses import dataclass, asdict
+from typing import Dict, FrozenSet, List, Optional, Tuple
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    ijson = None
+    IJSON_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+
+def _read_json(path: str):
+    """读取JSON文件 (有orjson时直接解析字节, 否则回退到标准库json)"""
+    if ORJSON_AVAILABLE:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@dataclass(slots=True)
 class ProtectedContract:
     """被保护的合约信息"""
     address: str
     name: Optional[str] = None
 
-@dataclass
+    def __post_init__(self):
+        # 同一地址在多个配置/函数中反复出现，驻留后比较与哈希只需一次
+        self.address = sys.intern(self.address)
+
+    def to_dict(self) -> Dict:
+        return {'address': self.address, 'name': self.name}
+
+@dataclass(slots=True)
 class ProtectedFunction:
     """被保护的函数信息"""
     contract_address: str
@@ -34,7 +69,19 @@ class ProtectedFunction:
     signature: Optional[str] = None
     selector: Optional[str] = None
 
-@dataclass
+    def __post_init__(self):
+        self.contract_address = sys.intern(self.contract_address)
+
+    def to_dict(self) -> Dict:
+        return {
+            'contract_address': self.contract_address,
+            'function': self.function,
+            'contract_name': self.contract_name,
+            'signature': self.signature,
+            'selector': self.selector,
+        }
+
+@dataclass(slots=True)
 class FirewallConfig:
     """防火墙配置"""
     protocol: str
@@ -43,19 +90,41 @@ class FirewallConfig:
     protected_functions: List[ProtectedFunction]
     source: str  # 配置来源：constraint_rules_v2, firewall_env等
 
-    def get_contract_addresses(self) -> Set[str]:
+    # 派生的查询结构（不参与比较和输出）。配置加载后视为只读，不会因列表被修改而重建
+    _addrs: FrozenSet[str] = field(init=False, repr=False, compare=False, default=frozenset())
+    _fnames: FrozenSet[str] = field(init=False, repr=False, compare=False, default=frozenset())
+    _by_addr: Optional[Dict[str, List[ProtectedFunction]]] = field(init=False, repr=False, compare=False, default=None)
+
+    def __post_init__(self):
+        self._addrs = frozenset(sys.intern(c.address.lower()) for c in self.protected_contracts)
+        self._fnames = frozenset(f.function for f in self.protected_functions)
+
+    def to_dict(self) -> Dict:
+        """转换为可序列化的字典（与dataclasses.asdict的字段一致，不含派生查询结构）"""
+        return {
+            'protocol': self.protocol,
+            'year_month': self.year_month,
+            'protected_contracts': [c.to_dict() for c in self.protected_contracts],
+            'protected_functions': [f.to_dict() for f in self.protected_functions],
+            'source': self.source,
+        }
+
+    def get_contract_addresses(self) -> FrozenSet[str]:
         """获取所有被保护合约地址（小写）"""
-        return {c.address.lower() for c in self.protected_contracts}
+        return self._addrs
 
-    def get_function_names(self) -> Set[str]:
+    def get_function_names(self) -> FrozenSet[str]:
         """获取所有被保护函数名"""
-        return {f.function for f in self.protected_functions}
+        return self._fnames
 
     def get_functions_for_contract(self, contract_address: str) -> List[ProtectedFunction]:
-        """获取特定合约的被保护函数列表"""
-        addr_lower = contract_address.lower()
-        return [f for f in self.protected_functions
-                if f.contract_address.lower() == addr_lower]
+        """获取特定合约的被保护函数列表（首次调用时按小写地址建立索引）"""
+        if self._by_addr is None:
+            by_addr = defaultdict(list)
+            for f in self.protected_functions:
+                by_addr[sys.intern(f.contract_address.lower())].append(f)
+            self._by_addr = dict(by_addr)
+        return list(self._by_addr.get(contract_address.lower(), ()))
 
 
 class FirewallConfigReader:
@@ -64,10 +133,12 @@ class FirewallConfigReader:
     def __init__(self, project_root: Path):
         self.project_root = Path(project_root)
         self.logger = logging.getLogger(__name__ + '.FirewallConfigReader')
+        # (protocol, year_month) -> 已加载的配置 (未找到时为None), 批量模式下避免重复读取JSON
+        self._cache: Dict[Tuple[str, str], Optional[FirewallConfig]] = {}
 
     def load_config(self, protocol: str, year_month: str) -> Optional[FirewallConfig]:
         """
-        加载防火墙配置
+        加载防火墙配置（结果按 (protocol, year_month) 缓存）
 
         Args:
             protocol: 协议名（如 BarleyFinance_exp）
@@ -76,18 +147,71 @@ class FirewallConfigReader:
         Returns:
             FirewallConfig 或 None
         """
+        key = (protocol, year_month)
+        if key not in self._cache:
+            self._cache[key] = self._load_config_uncached(protocol, year_month)
+        return self._cache[key]
+
+    def load_many(self, pairs: List[Tuple[str, str]], workers: int = 16) -> Dict[Tuple[str, str], Optional[FirewallConfig]]:
+        """
+        并发加载多个协议的配置（批量模式）
+
+        加载主要是磁盘I/O，读取和stat期间会释放GIL，用线程池即可重叠I/O
+
+        Args:
+            pairs: [(protocol, year_month), ...]
+            workers: 线程数
+
+        Returns:
+            {(protocol, year_month): FirewallConfig 或 None}
+        """
+        unique_pairs = list(dict.fromkeys(pairs))
+        if len(unique_pairs) <= 1 or workers <= 1:
+            return {pair: self.load_config(*pair) for pair in unique_pairs}
+
+        with ThreadPoolExecutor(max_workers=min(workers, len(unique_pairs))) as executor:
+            configs = executor.map(lambda pair: self.load_config(*pair), unique_pairs)
+            return dict(zip(unique_pairs, configs))
+
+    def invalidate(self, protocol: Optional[str] = None, year_month: Optional[str] = None):
+        """
+        清除缓存的配置（配置文件被重新生成后调用）
+
+        不传参数时清空全部缓存；只传protocol时清除该协议所有年月的缓存
+        """
+        if protocol is None:
+            self._cache.clear()
+        elif year_month is not None:
+            self._cache.pop((protocol, year_month), None)
+        else:
+            for key in [k for k in self._cache if k[0] == protocol]:
+                del self._cache[key]
+
+    def _load_config_uncached(self, protocol: str, year_month: str) -> Optional[FirewallConfig]:
+        """按优先级依次尝试各配置源"""
         # 尝试多个配置源，按优先级
         # 最高优先级：firewall_injection_record.json（来自批量注入）
         loaders = [
-            self._load_from_injection_record,
-            self._load_from_constraint_rules_v2,
-            self._load_from_solved_constraints,
-            self._load_from_invariants,
+            ('firewall_injection_record.json', self._load_from_injection_record),
+            ('constraint_rules_v2.json', self._load_from_constraint_rules_v2),
+            ('solved_constraints.json', self._load_from_solved_constraints),
+            ('invariants_v2.json', self._load_from_invariants),
         ]
 
-        for loader in loaders:
+        # 一次扫描协议目录，只调用对应文件存在的加载器
+        # 协议目录只拼接一次，以字符串传给各加载器
+        base = os.path.join(str(self.project_root), 'extracted_contracts', year_month, protocol)
+        try:
+            with os.scandir(base) as entries:
+                present = {entry.name for entry in entries}
+        except (FileNotFoundError, NotADirectoryError):
+            present = set()
+
+        for filename, loader in loaders:
+            if filename not in present:
+                continue
             try:
-                config = loader(protocol, year_month)
+                config = loader(protocol, year_month, base)
                 if config and config.protected_contracts:
                     self.logger.info(f"  ✓ 从 {config.source} 加载防火墙配置")
                     self.logger.info(f"    被保护合约: {len(config.protected_contracts)} 个")
@@ -100,7 +224,7 @@ class FirewallConfigReader:
         self.logger.warning(f"  未找到 {protocol}/{year_month} 的防火墙配置")
         return None
 
-    def _load_from_injection_record(self, protocol: str, year_month: str) -> Optional[FirewallConfig]:
+    def _load_from_injection_record(self, protocol: str, year_month: str, base: str) -> Optional[FirewallConfig]:
         """
         从 firewall_injection_record.json 加载配置（最高优先级）
 
@@ -110,13 +234,12 @@ class FirewallConfigReader:
         - injected_contracts[].file: 注入的文件名
         - injected_contracts[].functions: 注入的函数列表
         """
-        config_file = self.project_root / 'extracted_contracts' / year_month / protocol / 'firewall_injection_record.json'
+        config_file = os.path.join(base, 'firewall_injection_record.json')
 
-        if not config_file.exists():
+        if not os.path.exists(config_file):
             return None
 
-        with open(config_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = _read_json(config_file)
 
         # 检查必需字段
         main_contract = data.get('main_contract', {})
@@ -130,29 +253,23 @@ class FirewallConfigReader:
             return None
 
         # 提取被保护合约
+        contract_address = main_contract['address']
+        contract_name = main_contract.get('actual_contract_name') or main_contract.get('name')
         protected_contracts = [
-            ProtectedContract(
-                address=main_contract['address'],
-                name=main_contract.get('actual_contract_name') or main_contract.get('name')
-            )
+            ProtectedContract(address=contract_address, name=contract_name)
         ]
 
         # 提取被保护函数
-        protected_functions = []
-        contract_address = main_contract['address']
-        contract_name = main_contract.get('actual_contract_name') or main_contract.get('name')
-
-        for contract_info in injected_contracts:
-            for func_name in contract_info.get('functions', []):
-                func = ProtectedFunction(
-                    contract_address=contract_address,
-                    contract_name=contract_name,
-                    function=func_name,
-                    # signature 和 selector 在这个文件中没有，后续可以通过分析获取
-                    signature=None,
-                    selector=None
-                )
-                protected_functions.append(func)
+        # signature 和 selector 在这个文件中没有，后续可以通过分析获取
+        protected_functions = [
+            ProtectedFunction(
+                contract_address=contract_address,
+                contract_name=contract_name,
+                function=func_name
+            )
+            for contract_info in injected_contracts
+            for func_name in contract_info.get('functions', [])
+        ]
 
         return FirewallConfig(
             protocol=protocol,
@@ -162,7 +279,7 @@ class FirewallConfigReader:
             source='firewall_injection_record.json'
         )
 
-    def _load_from_constraint_rules_v2(self, protocol: str, year_month: str) -> Optional[FirewallConfig]:
+    def _load_from_constraint_rules_v2(self, protocol: str, year_month: str, base: str) -> Optional[FirewallConfig]:
         """
         从 constraint_rules_v2.json 加载配置
 
@@ -171,13 +288,12 @@ class FirewallConfigReader:
         - constraints[].function: 被保护的函数名
         - constraints[].signature: 完整函数签名
         """
-        config_file = self.project_root / 'extracted_contracts' / year_month / protocol / 'constraint_rules_v2.json'
+        config_file = os.path.join(base, 'constraint_rules_v2.json')
 
-        if not config_file.exists():
+        if not os.path.exists(config_file):
             return None
 
-        with open(config_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = _read_json(config_file)
 
         # 提取被保护合约
         vuln_contract = data.get('vulnerable_contract', {})
@@ -185,24 +301,23 @@ class FirewallConfigReader:
             self.logger.debug(f"  constraint_rules_v2.json 中没有 vulnerable_contract 信息")
             return None
 
+        contract_address = vuln_contract['address']
+        contract_name = vuln_contract.get('name')
         protected_contracts = [
-            ProtectedContract(
-                address=vuln_contract['address'],
-                name=vuln_contract.get('name')
-            )
+            ProtectedContract(address=contract_address, name=contract_name)
         ]
 
-        # 提取被保护函数
-        protected_functions = []
-        for constraint in data.get('constraints', []):
-            func = ProtectedFunction(
-                contract_address=vuln_contract['address'],
-                contract_name=vuln_contract.get('name'),
+        # 提取被保护函数（合约字段在循环外取一次，循环内只读约束自身的字段）
+        protected_functions = [
+            ProtectedFunction(
+                contract_address=contract_address,
+                contract_name=contract_name,
                 function=constraint.get('function', ''),
                 signature=constraint.get('signature'),
                 selector=constraint.get('selector')
             )
-            protected_functions.append(func)
+            for constraint in data.get('constraints', [])
+        ]
 
         return FirewallConfig(
             protocol=protocol,
@@ -212,36 +327,34 @@ class FirewallConfigReader:
             source='constraint_rules_v2.json'
         )
 
-    def _load_from_solved_constraints(self, protocol: str, year_month: str) -> Optional[FirewallConfig]:
+    def _load_from_solved_constraints(self, protocol: str, year_month: str, base: str) -> Optional[FirewallConfig]:
         """从 solved_constraints.json 加载配置"""
-        config_file = self.project_root / 'extracted_contracts' / year_month / protocol / 'solved_constraints.json'
+        config_file = os.path.join(base, 'solved_constraints.json')
 
-        if not config_file.exists():
+        if not os.path.exists(config_file):
             return None
 
-        with open(config_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = _read_json(config_file)
 
         vuln_contract = data.get('vulnerable_contract', {})
         if not vuln_contract or not vuln_contract.get('address'):
             return None
 
+        contract_address = vuln_contract['address']
+        contract_name = vuln_contract.get('name')
         protected_contracts = [
-            ProtectedContract(
-                address=vuln_contract['address'],
-                name=vuln_contract.get('name')
-            )
+            ProtectedContract(address=contract_address, name=contract_name)
         ]
 
-        protected_functions = []
-        for constraint in data.get('solved_constraints', []):
-            func = ProtectedFunction(
-                contract_address=vuln_contract['address'],
-                contract_name=vuln_contract.get('name'),
+        protected_functions = [
+            ProtectedFunction(
+                contract_address=contract_address,
+                contract_name=contract_name,
                 function=constraint.get('function', ''),
                 signature=constraint.get('signature')
             )
-            protected_functions.append(func)
+            for constraint in data.get('solved_constraints', [])
+        ]
 
         return FirewallConfig(
             protocol=protocol,
@@ -251,37 +364,31 @@ class FirewallConfigReader:
             source='solved_constraints.json'
         )
 
-    def _load_from_invariants(self, protocol: str, year_month: str) -> Optional[FirewallConfig]:
+    def _load_from_invariants(self, protocol: str, year_month: str, base: str) -> Optional[FirewallConfig]:
         """
         从 invariants_v2.json 加载配置
 
         从不变量定义中提取需要保护的合约列表
         """
-        config_file = self.project_root / 'extracted_contracts' / year_month / protocol / 'invariants_v2.json'
+        config_file = os.path.join(base, 'invariants_v2.json')
 
-        if not config_file.exists():
+        if not os.path.exists(config_file):
             return None
 
-        with open(config_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-        # 从storage_invariants中提取合约
-        protected_contracts_set = set()
+        # 从storage_invariants中收集候选地址
+        candidate_addrs = []
 
         # invariants_v2.json 的结构可能是 {"invariants": [...], ...}
-        invariants = data.get('invariants', [])
-
-        for inv in invariants:
+        for inv in self._iter_invariants(config_file):
             # 尝试从不同的字段提取合约地址
-            contracts = inv.get('contracts', [])
-            for addr in contracts:
-                if addr and addr.startswith('0x'):
-                    protected_contracts_set.add(addr.lower())
+            candidate_addrs.extend(inv.get('contracts', []))
 
             # 也尝试从 contract_address 字段提取
             contract_addr = inv.get('contract_address')
-            if contract_addr and contract_addr.startswith('0x'):
-                protected_contracts_set.add(contract_addr.lower())
+            if contract_addr:
+                candidate_addrs.append(contract_addr)
+
+        protected_contracts_set = {addr.lower() for addr in candidate_addrs if addr and addr[:2] == '0x'}
 
         if not protected_contracts_set:
             return None
@@ -299,6 +406,19 @@ class FirewallConfigReader:
             source='invariants_v2.json'
         )
 
+    @staticmethod
+    def _iter_invariants(config_file: str):
+        """
+        逐条产出 invariants_v2.json 中的不变量
+
+        有ijson时流式解析，只在内存中保留当前一条不变量；否则整体加载
+        """
+        if IJSON_AVAILABLE:
+            with open(config_file, 'rb') as f:
+                yield from ijson.items(f, 'invariants.item')
+        else:
+            yield from _read_json(config_file).get('invariants', [])
+
     def get_analysis_targets(self, protocol: str, year_month: str) -> Optional[Dict]:
         """
         获取约束分析目标（简化接口）
@@ -333,4 +453,8 @@ if __name__ == '__main__':
         print(f"\n被保护合约: {targets['contract_addresses']}")
         print(f"被保护函数: {targets['function_names']}")
         print(f"\n完整配置:")
-        print(json.dumps(asdict(targets['config']), indent=2, ensure_ascii=False))
+        config_dict = targets['config'].to_dict()
+        if ORJSON_AVAILABLE:
+            print(orjson.dumps(config_dict, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode())
+        else:
+            print(json.dumps(config_dict, indent=2, ensure_ascii=False))
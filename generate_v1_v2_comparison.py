@@ -12,13 +12,23 @@
 """
 
 import json
+import os
 import sys
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, field
+from functools import lru_cache
 from collections import defaultdict, Counter
+from concurrent.futures import ProcessPoolExecutor
 import logging
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
 # 设置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -27,6 +37,27 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=512)
+def _infer_category(inv_type: str) -> str:
+    """根据v1不变量的type推断category (v1没有category字段)"""
+    if "balance" in inv_type or "supply" in inv_type:
+        return "balance_constraint"
+    elif "price" in inv_type or "ratio" in inv_type:
+        return "ratio_stability"
+    elif "reentrancy" in inv_type:
+        return "state_consistency"
+    return "unknown"
+
+
+def _read_json(path: Path):
+    """读取JSON文件 (有orjson时直接解析字节, 否则回退到标准库json)"""
+    if ORJSON_AVAILABLE:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
 @dataclass
 class InvariantStats:
     """不变量统计数据"""
@@ -75,7 +106,9 @@ class ComparisonReportGenerator:
             logger.error(f"目录不存在: {search_dir}")
             return []
 
-        protocol_dirs = [d for d in search_dir.iterdir() if d.is_dir()]
+        # scandir直接带回目录项类型, 不必为每个条目再stat一次
+        with os.scandir(search_dir) as entries:
+            protocol_dirs = [Path(entry.path) for entry in entries if entry.is_dir()]
         logger.info(f"找到 {len(protocol_dirs)} 个协议目录")
         return protocol_dirs
 
@@ -83,12 +116,11 @@ class ComparisonReportGenerator:
         """加载v1不变量数据"""
         v1_path = protocol_dir / "invariants.json"
 
-        if not v1_path.exists():
-            return None
-
+        # 直接打开, 文件不存在时由open报告, 省去单独的exists()调用
         try:
-            with open(v1_path, 'r') as f:
-                return json.load(f)
+            return _read_json(v1_path)
+        except FileNotFoundError:
+            return None
         except Exception as e:
             logger.warning(f"无法加载v1数据 {protocol_dir.name}: {e}")
             return None
@@ -97,12 +129,10 @@ class ComparisonReportGenerator:
         """加载v2不变量数据"""
         v2_path = protocol_dir / "invariants_v2.json"
 
-        if not v2_path.exists():
-            return None
-
         try:
-            with open(v2_path, 'r') as f:
-                return json.load(f)
+            return _read_json(v2_path)
+        except FileNotFoundError:
+            return None
         except Exception as e:
             logger.warning(f"无法加载v2数据 {protocol_dir.name}: {e}")
             return None
@@ -115,26 +145,11 @@ class ComparisonReportGenerator:
         invariants = data.get("storage_invariants", [])
         stats.total_count = len(invariants)
 
-        # 统计类别和严重程度
-        for inv in invariants:
-            # 类别 (v1没有category字段，根据type推断)
-            inv_type = inv.get("type", "unknown")
-            stats.by_type[inv_type] = stats.by_type.get(inv_type, 0) + 1
-
-            # 根据type推断category
-            if "balance" in inv_type or "supply" in inv_type:
-                category = "balance_constraint"
-            elif "price" in inv_type or "ratio" in inv_type:
-                category = "ratio_stability"
-            elif "reentrancy" in inv_type:
-                category = "state_consistency"
-            else:
-                category = "unknown"
-            stats.by_category[category] = stats.by_category.get(category, 0) + 1
-
-            # 严重程度
-            severity = inv.get("severity", "unknown")
-            stats.by_severity[severity] = stats.by_severity.get(severity, 0) + 1
+        # 统计类型、类别和严重程度 (类别: v1没有category字段，根据type推断)
+        types = [inv.get("type", "unknown") for inv in invariants]
+        stats.by_type = dict(Counter(types))
+        stats.by_category = dict(Counter(map(_infer_category, types)))
+        stats.by_severity = dict(Counter(inv.get("severity", "unknown") for inv in invariants))
 
         return stats
 
@@ -148,63 +163,81 @@ class ComparisonReportGenerator:
             stats.by_severity = data["statistics"].get("by_severity", {})
 
         if "invariants" in data:
-            for inv in data["invariants"]:
-                inv_type = inv.get("type", "unknown")
-                stats.by_type[inv_type] = stats.by_type.get(inv_type, 0) + 1
+            stats.by_type = dict(Counter(inv.get("type", "unknown") for inv in data["invariants"]))
 
         return stats
 
     def calculate_quality_score(self, analysis: ProtocolAnalysis) -> float:
         """计算质量评分 (0-100)"""
         score = 0.0
+        score += self._score_count(analysis)
+        score += self._score_type(analysis)
+        score += self._score_patterns(analysis)
+        score += self._score_semantic(analysis)
+        score += self._score_state(analysis)
+        return min(score, 100.0)  # 最高100分
 
-        # 1. 不变量数量得分 (0-25分)
+    @staticmethod
+    def _score_count(analysis: ProtocolAnalysis) -> float:
+        """1. 不变量数量得分 (0-25分)"""
         if analysis.v2_invariants.total_count > 0:
             # 根据不变量数量给分,最多25分
-            count_score = min(analysis.v2_invariants.total_count * 3, 25)
-            score += count_score
+            return min(analysis.v2_invariants.total_count * 3, 25)
+        return 0.0
 
-        # 2. 协议类型检测得分 (0-20分)
+    @staticmethod
+    def _score_type(analysis: ProtocolAnalysis) -> float:
+        """2. 协议类型检测得分 (0-20分)"""
         if analysis.protocol_type and analysis.protocol_type != "unknown":
-            score += 10 + (analysis.protocol_confidence * 10)
+            return 10 + (analysis.protocol_confidence * 10)
+        return 0.0
 
-        # 3. 攻击模式检测得分 (0-25分)
+    @staticmethod
+    def _score_patterns(analysis: ProtocolAnalysis) -> float:
+        """3. 攻击模式检测得分 (0-25分)"""
         pattern_count = len(analysis.v2_attack_patterns)
-        if pattern_count > 0:
-            # 根据攻击模式数量和置信度给分
-            pattern_score = min(pattern_count * 3, 15)
+        if pattern_count == 0:
+            return 0.0
+
+        # 根据攻击模式数量和置信度给分
+        pattern_score = min(pattern_count * 3, 15)
 
-            # 加上置信度加权
-            avg_confidence = sum(p.get("confidence", 0) for p in analysis.v2_attack_patterns) / pattern_count
-            confidence_score = avg_confidence * 10
+        # 加上置信度加权
+        avg_confidence = sum(p.get("confidence", 0) for p in analysis.v2_attack_patterns) / pattern_count
+        confidence_score = avg_confidence * 10
 
-            score += pattern_score + confidence_score
+        return pattern_score + confidence_score
 
-        # 4. 语义映射覆盖率得分 (0-15分)
+    @staticmethod
+    def _score_semantic(analysis: ProtocolAnalysis) -> float:
+        """4. 语义映射覆盖率得分 (0-15分)"""
         if analysis.v2_semantic_coverage > 0:
-            score += analysis.v2_semantic_coverage * 100 * 0.15  # 转换为0-15分
+            return analysis.v2_semantic_coverage * 100 * 0.15  # 转换为0-15分
+        return 0.0
 
-        # 5. 状态变化分析深度得分 (0-15分)
-        if analysis.v2_state_changes:
-            depth_score = 0
+    @staticmethod
+    def _score_state(analysis: ProtocolAnalysis) -> float:
+        """5. 状态变化分析深度得分 (0-15分)"""
+        if not analysis.v2_state_changes:
+            return 0.0
 
-            # 合约变化数量
-            if analysis.v2_state_changes.get("contracts_changed", 0) > 0:
-                depth_score += 5
+        depth_score = 0
 
-            # 槽位变化数量
-            slots_changed = analysis.v2_state_changes.get("slots_changed", 0)
-            if slots_changed > 0:
-                depth_score += min(slots_changed / 10, 5)
+        # 合约变化数量
+        if analysis.v2_state_changes.get("contracts_changed", 0) > 0:
+            depth_score += 5
 
-            # 极端变化检测
-            extreme_changes = analysis.v2_state_changes.get("extreme_changes", 0)
-            if extreme_changes > 0:
-                depth_score += min(extreme_changes / 5, 5)
+        # 槽位变化数量
+        slots_changed = analysis.v2_state_changes.get("slots_changed", 0)
+        if slots_changed > 0:
+            depth_score += min(slots_changed / 10, 5)
 
-            score += depth_score
+        # 极端变化检测
+        extreme_changes = analysis.v2_state_changes.get("extreme_changes", 0)
+        if extreme_changes > 0:
+            depth_score += min(extreme_changes / 5, 5)
 
-        return min(score, 100.0)  # 最高100分
+        return depth_score
 
     def analyze_protocol(self, protocol_dir: Path) -> ProtocolAnalysis:
         """分析单个协议的v1和v2数据"""
@@ -248,13 +281,17 @@ class ComparisonReportGenerator:
         """生成完整对比报告"""
         protocol_dirs = self.scan_protocols(year_month)
 
-        # 分析每个协议
-        for protocol_dir in protocol_dirs:
-            analysis = self.analyze_protocol(protocol_dir)
+        # 分析每个协议 (各协议相互独立, 多个目录时用进程池并行读取和解析)
+        if len(protocol_dirs) > 1:
+            with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+                analyses = list(executor.map(
+                    _analyze_protocol_dir, [str(d) for d in protocol_dirs], chunksize=16
+                ))
+        else:
+            analyses = [self.analyze_protocol(d) for d in protocol_dirs]
 
-            # 只包含有数据的协议
-            if analysis.has_v1 or analysis.has_v2:
-                self.protocols.append(analysis)
+        # 只包含有数据的协议
+        self.protocols.extend(a for a in analyses if a.has_v1 or a.has_v2)
 
         logger.info(f"分析完成: {len(self.protocols)} 个协议有不变量数据")
 
@@ -399,12 +436,23 @@ class ComparisonReportGenerator:
 
     def save_report(self, report: Dict, output_path: Path):
         """保存报告到JSON文件"""
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(report, f, indent=2, ensure_ascii=False)
+        if ORJSON_AVAILABLE:
+            Path(output_path).write_bytes(
+                orjson.dumps(report, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+            )
+        else:
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
 
         logger.info(f"报告已保存到: {output_path}")
 
 
+def _analyze_protocol_dir(protocol_dir: str) -> ProtocolAnalysis:
+    """进程池worker: 分析单个协议目录 (模块级函数以便pickle)"""
+    path = Path(protocol_dir)
+    return ComparisonReportGenerator(path.parent).analyze_protocol(path)
+
+
 def main():
     """主函数"""
     # 设置路径
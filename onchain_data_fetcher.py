@@ -14,16 +14,24 @@
 """
 
 import asyncio
+import heapq
 import aiohttp
 import json
 import time
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
-from collections import defaultdict
+from collections import defaultdict, deque
 import logging
 from web3 import Web3
 from web3.exceptions import ContractLogicError
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -41,8 +49,12 @@ class APIKeyPool:
     - 轮询使用多个密钥,实现负载均衡
     - 滑动窗口限流(每个密钥3次/秒)
     - 自动等待当所有密钥都达到限流时
+    - acquire(): 协程版本, 等待时不阻塞事件循环 (与同步版本共用同一限流窗口)
     """
 
+    # 密钥数超过此值时改用堆选取, 避免每次线性扫描
+    HEAP_THRESHOLD = 16
+
     def __init__(self, keys: List[str], rate_limit: int = 3):
         """
         初始化API密钥池
@@ -56,10 +68,14 @@ class APIKeyPool:
 
         self.keys = keys
         self.rate_limit = rate_limit
-        # 记录每个密钥的请求时间戳(滑动窗口)
-        self.request_counts = {key: [] for key in keys}
+        # 记录每个密钥的请求时间戳(滑动窗口), 按时间递增
+        self.request_counts = {key: deque() for key in keys}
         # 统计每个密钥的使用次数
         self.key_usage = {key: 0 for key in keys}
+        # 密钥较多时: (下次可用时间, 序号, 密钥) 小顶堆, 每个密钥恰有一项
+        self._free_heap = None
+        if len(keys) > self.HEAP_THRESHOLD:
+            self._free_heap = [(0.0, i, key) for i, key in enumerate(keys)]
 
         logger.info(f"API密钥池已初始化: {len(keys)}个密钥, 限流{rate_limit}次/秒")
 
@@ -75,34 +91,80 @@ class APIKeyPool:
         Returns:
             可用的API密钥
         """
-        now = time.time()
+        while True:
+            key, wait_time = self._try_take_key(time.monotonic())
+            if key is not None:
+                return key
+
+            logger.debug(f"所有密钥已达限流,等待{wait_time:.3f}秒")
+            time.sleep(wait_time + 0.01)  # +0.01避免边界情况
+
+    async def acquire(self) -> str:
+        """
+        获取当前可用的API密钥 (协程版本)
+
+        与get_available_key使用同一滑动窗口, 只是用asyncio.sleep等待,
+        不会阻塞同一事件循环上的其他请求; 状态不绑定事件循环,
+        同一密钥池可跨多次asyncio.run使用
+
+        Returns:
+            可用的API密钥
+        """
+        while True:
+            key, wait_time = self._try_take_key(time.monotonic())
+            if key is not None:
+                return key
+
+            logger.debug(f"所有密钥已达限流,等待{wait_time:.3f}秒")
+            await asyncio.sleep(wait_time + 0.01)  # +0.01避免边界情况
+
+    def _try_take_key(self, now: float) -> Tuple[Optional[str], float]:
+        """
+        尝试占用一个未达到限流的密钥
+
+        Returns:
+            (密钥, 0.0); 所有密钥都达到限流时为 (None, 需要等待的秒数)
+        """
+        if self._free_heap is not None:
+            return self._try_take_key_heap(now)
 
         # 遍历所有密钥
         for key in self.keys:
+            timestamps = self.request_counts[key]
             # 清理1秒前的请求记录(滑动窗口)
-            self.request_counts[key] = [
-                timestamp for timestamp in self.request_counts[key]
-                if now - timestamp < 1.0
-            ]
+            while timestamps and now - timestamps[0] >= 1.0:
+                timestamps.popleft()
 
             # 如果此密钥在当前秒内请求次数<限流值,返回它
-            if len(self.request_counts[key]) < self.rate_limit:
-                self.request_counts[key].append(now)
+            if len(timestamps) < self.rate_limit:
+                timestamps.append(now)
                 self.key_usage[key] += 1
-                return key
+                return key, 0.0
 
         # 所有密钥都达到限流,计算需要等待的时间
         min_wait_time = min(
-            1.0 - (now - min(counts))
+            1.0 - (now - counts[0])
             for counts in self.request_counts.values()
             if counts
         )
+        return None, min_wait_time
+
+    def _try_take_key_heap(self, now: float) -> Tuple[Optional[str], float]:
+        """堆选取: 取下次可用时间最早的密钥, O(log K)"""
+        free_at, index, key = self._free_heap[0]
+        if free_at > now:
+            return None, free_at - now
 
-        logger.debug(f"所有密钥已达限流,等待{min_wait_time:.3f}秒")
-        time.sleep(min_wait_time + 0.01)  # +0.01避免边界情况
+        timestamps = self.request_counts[key]
+        while timestamps and now - timestamps[0] >= 1.0:
+            timestamps.popleft()
+        timestamps.append(now)
+        self.key_usage[key] += 1
 
-        # 递归调用,重新获取
-        return self.get_available_key()
+        # 窗口已满时, 最早一条过期即可再次使用
+        free_at = timestamps[0] + 1.0 if len(timestamps) >= self.rate_limit else 0.0
+        heapq.heapreplace(self._free_heap, (free_at, index, key))
+        return key, 0.0
 
     def get_stats(self) -> Dict:
         """获取密钥池使用统计"""
@@ -156,8 +218,7 @@ class FileCache:
             return None
 
         try:
-            with open(cache_file, 'r') as f:
-                cached = json.load(f)
+            cached = self._read(cache_file)
 
             # 检查是否过期
             if self.is_expired(cached):
@@ -190,20 +251,32 @@ class FileCache:
         }
 
         try:
-            with open(cache_file, 'w') as f:
-                json.dump(cache_data, f, indent=2)
+            if ORJSON_AVAILABLE:
+                cache_file.write_bytes(orjson.dumps(cache_data, option=orjson.OPT_INDENT_2))
+            else:
+                with open(cache_file, 'w') as f:
+                    json.dump(cache_data, f, indent=2)
 
             logger.debug(f"缓存已保存: {address}")
 
         except Exception as e:
             logger.warning(f"保存缓存失败 {address}: {e}")
 
-    def is_expired(self, cached: dict) -> bool:
+    @staticmethod
+    def _read(cache_file: Path) -> dict:
+        """读取缓存文件 (有orjson时直接解析字节, 否则回退到标准库json)"""
+        if ORJSON_AVAILABLE:
+            return orjson.loads(cache_file.read_bytes())
+        with open(cache_file, 'r') as f:
+            return json.load(f)
+
+    def is_expired(self, cached: dict, now: Optional[float] = None) -> bool:
         """
         检查缓存是否过期
 
         Args:
             cached: 缓存数据(包含timestamp和ttl)
+            now: 当前时间戳,批量检查时由调用方传入同一个值(默认取time.time())
 
         Returns:
             True if 过期, False otherwise
@@ -211,8 +284,9 @@ class FileCache:
         if not cached or 'timestamp' not in cached or 'ttl' not in cached:
             return True
 
-        age = time.time() - cached['timestamp']
-        return age > cached['ttl']
+        if now is None:
+            now = time.time()
+        return now - cached['timestamp'] > cached['ttl']
 
     def clear(self):
         """清空所有缓存"""
@@ -226,11 +300,11 @@ class FileCache:
         total = len(cache_files)
 
         expired = 0
+        now = time.time()
         for cache_file in cache_files:
             try:
-                with open(cache_file, 'r') as f:
-                    cached = json.load(f)
-                if self.is_expired(cached):
+                cached = self._read(cache_file)
+                if self.is_expired(cached, now):
                     expired += 1
             except:
                 pass
@@ -461,7 +535,7 @@ class OnChainDataFetcher:
 
         使用 getsourcecode API
         """
-        api_key = self._get_api_key(chain)
+        api_key = await self._get_api_key(chain)
         if not api_key:
             return None
 
@@ -493,7 +567,7 @@ class OnChainDataFetcher:
 
                     elif response.status == 429:
                         # 限流,切换密钥重试
-                        api_key = self._get_api_key(chain)
+                        api_key = await self._get_api_key(chain)
                         params["apikey"] = api_key
                         await asyncio.sleep(0.5)
                         continue
@@ -516,7 +590,7 @@ class OnChainDataFetcher:
     ) -> Optional[str]:
         """获取合约ABI"""
         # 与_fetch_contract_name类似,这里简化实现
-        api_key = self._get_api_key(chain)
+        api_key = await self._get_api_key(chain)
         if not api_key:
             return None
 
@@ -646,7 +720,7 @@ class OnChainDataFetcher:
             logger.warning(f"获取ERC20信息错误 {address}: {e}")
             return None
 
-    def _get_api_key(self, chain: str) -> Optional[str]:
+    async def _get_api_key(self, chain: str) -> Optional[str]:
         """获取指定链的可用API密钥"""
         # 映射chain到key pool名称
         key_pool_mapping = {
@@ -661,7 +735,7 @@ class OnChainDataFetcher:
         if not pool_name or pool_name not in self.key_pools:
             return None
 
-        return self.key_pools[pool_name].get_available_key()
+        return await self.key_pools[pool_name].acquire()
 
     def _infer_semantic_type(
         self,
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+测试APIKeyPool的限流行为
+
+测试流程:
+1. 同一密钥池在两次asyncio.run中先后acquire (extract_contracts按协议逐个asyncio.run)
+2. 验证第二次在超时内完成 (不因上一个事件循环关闭而永久挂起), 且按滑动窗口等待 (距第一次acquire至少1秒)
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from onchain_data_fetcher import APIKeyPool
+
+
+def test_acquire_across_event_loops():
+    """跨事件循环复用密钥池"""
+    pool = APIKeyPool(["key_a", "key_b"], rate_limit=3)
+
+    async def burst(n):
+        return await asyncio.wait_for(
+            asyncio.gather(*[pool.acquire() for _ in range(n)]), timeout=5
+        )
+
+    # 第一个事件循环: 用满两个密钥的窗口
+    start = time.monotonic()
+    first = asyncio.run(burst(6))
+    assert sorted(first) == ["key_a"] * 3 + ["key_b"] * 3
+
+    # 第二个事件循环: 应在窗口过期后拿到密钥, 而不是挂起 (挂起时wait_for超时抛出)
+    second = asyncio.run(burst(1))
+    elapsed = time.monotonic() - start
+
+    assert second == ["key_a"]
+    # 窗口内的请求都晚于start, 距start至少1秒; 不限制上限以免负载较高时误报
+    assert elapsed >= 1.0, f"未按滑动窗口等待: {elapsed:.3f}秒"
+    assert pool.get_stats()["total_requests"] == 7
+
+    print(f"✅ 跨事件循环acquire正常, 共耗时{elapsed:.3f}秒")
+
+
+if __name__ == "__main__":
+    test_acquire_across_event_loops()